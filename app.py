@@ -3,22 +3,36 @@ import graphviz
 import time
 import os
 import uuid
+import json
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+import altair as alt
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langgraph.types import Command
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from deadlines import turn_config
+import memory_profile
+import latency_compare
+from watchlist import refresher as watchlist_refresher
 
 # Import the graphs
 # We use try/except to avoid errors if dependencies are missing during initial setup, 
 # ensuring the app shell still loads.
 try:
-    from chatbot_without_hitl import chatbot as chatbot_no_hitl
-    from chatbot_with_hitl import chatbot as chatbot_hitl
+    from chatbot_without_hitl import chatbot as chatbot_no_hitl, intent_router as router_no_hitl
+    from chatbot_with_hitl import chatbot as chatbot_hitl, pending_interrupts, intent_router as router_hitl, prepare_approval
 except ImportError as e:
     st.error(f"Failed to import chatbots: {e}")
 
 load_dotenv()
 
+# The Memory Admin view exposes every session's data and process-wide tools,
+# so it only exists when ADMIN_TOKEN is set, and asks for that token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # --- Configurations ---
 st.set_page_config(
     layout="wide", 
@@ -33,6 +47,47 @@ with st.sidebar:
     st.markdown("[![GitHub](https://img.shields.io/badge/GitHub-Repo-black?style=flat&logo=github)](https://github.com/ashumishra2104/Human_in_the_loop_demo)")
     st.info("Explore how AI Agents handle interactions with and without human oversight.")
 
+    # Quote requests answered by the rule-based router instead of the LLM
+    if 'router_hitl' in globals():
+        with st.expander("⚡ Quote Fast Path"):
+            for label, router in (("Demo 2", router_no_hitl), ("Demo 3", router_hitl)):
+                stats = router.stats()
+                saved = stats["estimated_seconds_saved"]
+                st.markdown(f"**{label}:** {stats['hits']}/{stats['requests']} hits ({stats['hit_rate']:.0%})")
+                if saved is not None:
+                    st.caption(f"~{saved:.1f}s of LLM time saved")
+
+    if ADMIN_TOKEN and st.button("🛠️ Memory Admin"):
+        st.session_state.current_view = 'admin'
+
+
+# Live price badges for watched symbols, fed by the background refresher
+@st.fragment(run_every=5)
+def render_price_badges():
+    if 'price_updates' not in st.session_state:
+        st.session_state.price_updates = watchlist_refresher.subscribe()
+        st.session_state.price_badges = {
+            sym: data["Global Quote"] for sym, data in watchlist_refresher.snapshot().items()
+        }
+    updates = st.session_state.price_updates
+    while not updates.empty():
+        update = updates.get_nowait()
+        st.session_state.price_badges[update["symbol"]] = update["quote"]
+
+    if not st.session_state.price_badges:
+        st.caption("No watched symbols yet. Ask for a quote to start tracking one.")
+        return
+    for sym, quote in sorted(st.session_state.price_badges.items()):
+        pct = quote.get("10. change percent")
+        color = "gray" if not pct else "red" if pct.startswith("-") else "green"
+        label = f"{sym} ${float(quote['05. price']):,.2f}" + (f" {pct}" if pct else "")
+        st.badge(label, color=color)
+
+
+with st.sidebar:
+    st.markdown("### 📈 Watchlist")
+    render_price_badges()
+
 # Custom CSS for the Dashboard
 st.markdown("""
 <style>
@@ -77,6 +132,11 @@ st.markdown("""
 if 'current_view' not in st.session_state:
     st.session_state.current_view = 'home'
 
+# Let the Memory Admin view see every live session's state, not just its own
+_ctx = get_script_run_ctx()
+if _ctx is not None:
+    memory_profile.sessions.register(_ctx.session_id, _ctx.session_state)
+
 # --- Navigation Helpers ---
 def navigate_to(view_name):
     st.session_state.current_view = view_name
@@ -90,7 +150,7 @@ def render_home():
     st.markdown("### Explore different levels of AI Agent autonomy and control.")
     st.markdown("---")
     
-    col1, col2, col3 = st.columns(3, gap="medium")
+    col1, col2, col3, col4 = st.columns(4, gap="medium")
     
     with col1:
         st.markdown("""
@@ -122,6 +182,16 @@ def render_home():
         if st.button("Launch Demo 3"):
             navigate_to('demo3')
 
+    with col4:
+        st.markdown("""
+        <div class="card">
+            <h3>Demo 4: Latency Comparison</h3>
+            <p>Sends the same prompt to both agents at once and shows where the time goes, step by step. <br>(Speed vs Control)</p>
+        </div>
+        """, unsafe_allow_html=True)
+        if st.button("Launch Demo 4"):
+            navigate_to('demo4')
+
 
 # ==============================================================================
 # VIEW: DEMO 1 (Basic Logic Flow)
@@ -251,7 +321,7 @@ def render_demo2():
         # Run Graph
         with st.chat_message("assistant"):
             with st.spinner("Thinking & Acting..."):
-                config = {"configurable": {"thread_id": st.session_state.d2_thread_id}}
+                config = turn_config(st.session_state.d2_thread_id)
                 # We need to construct the state correctly
                 # LangGraph expects a dict with 'messages'
                 response = chatbot_no_hitl.invoke({"messages": [user_msg]}, config=config)
@@ -311,7 +381,7 @@ def render_demo3():
         #          st.code(msg.content)
 
     # --- CHECK FOR INTERRUPTS (Pending Action) ---
-    config = {"configurable": {"thread_id": st.session_state.d3_thread_id}}
+    config = turn_config(st.session_state.d3_thread_id)
     
     # We inspect the CURRENT state of the graph to see if it is interrupted.
     current_state = chatbot_hitl.get_state(config)
@@ -379,7 +449,7 @@ def demo3_process_logic():
         user_text = st.session_state.d3_pending_input
         st.session_state.d3_pending_input = None # clear it
         
-        config = {"configurable": {"thread_id": st.session_state.d3_thread_id}}
+        config = turn_config(st.session_state.d3_thread_id)
         
         with st.spinner("Agent processing..."):
              # Invoke with new message
@@ -393,6 +463,7 @@ def demo3_process_logic():
 def render_demo3_fixed():
     st.button("← Back to Home", on_click=lambda: navigate_to('home'))
     st.title("Demo 3: Human-in-the-Loop Agent")
+    st.caption(f"Approvals pending across all sessions: {pending_interrupts.count()}")
     st.markdown("---")
 
     if 'd3_messages' not in st.session_state:
@@ -409,29 +480,38 @@ def render_demo3_fixed():
              with st.chat_message("assistant"):
                 st.markdown(msg.content)
 
-    # 2. Check Interrupts
-    config = {"configurable": {"thread_id": st.session_state.d3_thread_id}}
-    state = chatbot_hitl.get_state(config)
-    
+    # 2. Check Interrupts (O(1) lookup in the pending-approval index)
+    config = turn_config(st.session_state.d3_thread_id)
+    pending = pending_interrupts.get(st.session_state.d3_thread_id)
+
+    def resume_d3(decision):
+        with st.spinner("Resuming..."):
+            # Claim first so the expiry sweeper can't resume the same thread
+            if pending_interrupts.claim(st.session_state.d3_thread_id) is not None:
+                res = chatbot_hitl.invoke(Command(resume=decision), config=config)
+                st.session_state.d3_messages = res['messages']
+            else:
+                st.session_state.d3_messages = chatbot_hitl.get_state(config).values.get('messages', [])
+            st.rerun()
+
     is_interrupted = False
-    if state.next:
-        # Check for interrupt
-        if state.tasks and state.tasks[0].interrupts:
-            is_interrupted = True
-            intr = state.tasks[0].interrupts[0].value
-            with st.chat_message("assistant"):
-                st.warning(f"🛑 **APPROVAL NEEDED:** {intr}")
-                c1, c2 = st.columns(2)
-                if c1.button("✅ Approve"):
-                    with st.spinner("Resuming..."):
-                        res = chatbot_hitl.invoke(Command(resume="yes"), config=config)
-                        st.session_state.d3_messages = res['messages']
-                        st.rerun()
-                if c2.button("❌ Reject"):
-                    with st.spinner("Resuming..."):
-                        res = chatbot_hitl.invoke(Command(resume="no"), config=config)
-                        st.session_state.d3_messages = res['messages']
-                        st.rerun()
+    if pending is not None:
+        is_interrupted = True
+        with st.chat_message("assistant"):
+            st.warning(f"🛑 **APPROVAL NEEDED:** {pending.payload}")
+            # Prefetch the quote and pre-build both replies while the user decides
+            preview = prepare_approval(st.session_state.d3_thread_id)
+            if preview is not None and preview.quote_ready.wait(timeout=3) and preview.price is not None:
+                m1, m2 = st.columns(2)
+                m1.metric("Current Price", f"${preview.price:,.2f}")
+                m2.metric("Order Value", f"${preview.notional:,.2f}")
+            expires_in = max(0, int(pending_interrupts.ttl - pending.age()))
+            st.caption(f"Waiting {int(pending.age())}s · auto-'{pending_interrupts.default_decision}' in {expires_in}s")
+            c1, c2 = st.columns(2)
+            if c1.button("✅ Approve"):
+                resume_d3("yes")
+            if c2.button("❌ Reject"):
+                resume_d3("no")
 
     # 3. Chat Input (Only if not interrupted)
     if not is_interrupted:
@@ -449,6 +529,225 @@ def render_demo3_fixed():
                     st.rerun()
 
 
+# ==============================================================================
+# VIEW: DEMO 4 (Latency Comparison)
+# ==============================================================================
+def timeline_chart(timelines):
+    rows = [r for t in timelines for r in t.rows()]
+    if not rows:
+        return None
+    return alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+        x=alt.X("start_ms:Q", title="ms since prompt"),
+        x2="end_ms:Q",
+        y=alt.Y("graph:N", title=None),
+        color=alt.Color("kind:N", title="Step"),
+        opacity=alt.Opacity("phase:N", title="Phase", scale=alt.Scale(domain=["run", "resume"], range=[1.0, 0.6])),
+        tooltip=["graph:N", "node:N", "phase:N",
+                 alt.Tooltip("start_ms:Q", format=",.0f"), alt.Tooltip("end_ms:Q", format=",.0f")],
+    ).properties(height=160)
+
+
+# Keeps the interrupt-wait bar growing while the HITL run waits for a decision
+@st.fragment(run_every=1)
+def render_d4_waiting_timeline():
+    st.altair_chart(timeline_chart(st.session_state.d4_runs), width="stretch")
+
+
+def render_demo4():
+    st.button("← Back to Home", on_click=lambda: navigate_to('home'))
+    st.title("Demo 4: Latency Comparison")
+    st.caption("The same prompt runs through the autonomous and the HITL agent concurrently, "
+               "each on a fresh thread. Bars show router, LLM, tool, interrupt-wait and resume time.")
+    st.markdown("---")
+
+    runs = st.session_state.get('d4_runs')
+    autonomous, hitl = runs if runs else (None, None)
+
+    # 1. Run both graphs, redrawing the timeline while they stream
+    if hitl is None or not hitl.waiting:
+        if prompt := st.chat_input("Send the same prompt to both agents..."):
+            runs = [
+                latency_compare.RunTimeline("Autonomous (Demo 2)", f"d4-{uuid.uuid4()}", prompt),
+                latency_compare.RunTimeline("HITL (Demo 3)", f"d4-{uuid.uuid4()}", prompt),
+            ]
+            live = st.empty()
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [
+                    pool.submit(latency_compare.start_run, chatbot_no_hitl, runs[0]),
+                    pool.submit(latency_compare.start_run, chatbot_hitl, runs[1]),
+                ]
+                while not all(f.done() for f in futures):
+                    chart = timeline_chart(runs)
+                    if chart is not None:
+                        live.altair_chart(chart, width="stretch")
+                    time.sleep(0.2)
+            for t in runs:
+                if t.done:
+                    latency_compare.history.add(t)
+            st.session_state.d4_runs = runs
+            st.rerun()
+
+    if runs:
+        st.markdown(f"**Prompt:** {autonomous.prompt}")
+        if hitl.waiting:
+            render_d4_waiting_timeline()
+        else:
+            st.altair_chart(timeline_chart(runs), width="stretch")
+
+        # 2. Approval for the HITL run; the wait is part of its latency
+        if hitl.waiting:
+            with st.chat_message("assistant"):
+                st.warning(f"🛑 **APPROVAL NEEDED (HITL):** {hitl.interrupt}")
+                prepare_approval(hitl.thread_id)
+                c1, c2 = st.columns(2)
+                decision = None
+                if c1.button("✅ Approve"):
+                    decision = "yes"
+                if c2.button("❌ Reject"):
+                    decision = "no"
+            if decision:
+                with st.spinner("Resuming..."):
+                    if pending_interrupts.claim(hitl.thread_id) is not None:
+                        latency_compare.resume_timed(chatbot_hitl, hitl, decision)
+                        latency_compare.history.add(hitl)
+                    else:
+                        # The expiry sweeper resolved it; the timing no longer reflects a human decision
+                        hitl.error = "approval expired"
+                        hitl.finished_at = time.time()
+                st.rerun()
+
+        # 3. This run
+        c1, c2 = st.columns(2)
+        for col, t in ((c1, autonomous), (c2, hitl)):
+            with col:
+                st.subheader(t.graph)
+                if t.error:
+                    st.error(t.error)
+                elif t.done:
+                    st.markdown(t.output or "")
+                else:
+                    st.info("Waiting for approval...")
+        st.dataframe([t.summary() for t in runs], width="stretch")
+
+    # 4. All runs
+    st.subheader("Across Runs")
+    stats = latency_compare.history.aggregate()
+    if not stats:
+        st.info("No completed runs yet.")
+        return
+    st.dataframe(stats, width="stretch")
+    rows = [r for r in latency_compare.history.rows() if not r["error"]]
+    trend = alt.Chart(alt.Data(values=rows)).transform_calculate(
+        run_at="datum.timestamp * 1000"
+    ).mark_line(point=True).encode(
+        x=alt.X("run_at:T", title="Run time"),
+        y=alt.Y("total_ms:Q", title="Total ms"),
+        color=alt.Color("graph:N", title=None),
+        tooltip=["graph:N", "prompt:N", "total_ms:Q", "active_ms:Q", "wait_ms:Q"],
+    )
+    st.altair_chart(trend, width="stretch")
+
+
+# ==============================================================================
+# VIEW: ADMIN (Memory Accounting)
+# ==============================================================================
+def format_bytes(n):
+    if n is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+
+
+def render_admin():
+    if not ADMIN_TOKEN:
+        navigate_to('home')
+    st.button("← Back to Home", on_click=lambda: navigate_to('home'))
+    st.title("Admin: Memory Usage")
+    if not st.session_state.get('admin_authenticated'):
+        token = st.text_input("Admin token", type="password")
+        if token and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            st.session_state.admin_authenticated = True
+            st.rerun()
+        elif token:
+            st.error("Invalid token.")
+        return
+    st.caption("Checkpoint bytes per thread, the largest messages and the state size of every live session.")
+    st.markdown("---")
+
+    graphs = {"Demo 2 (no HITL)": chatbot_no_hitl, "Demo 3 (HITL)": chatbot_hitl}
+    report = memory_profile.build_report(graphs, st.session_state)
+
+    all_rows = [r for rows in report["graphs"].values() for r in rows]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Process RSS", format_bytes(report["process_rss_bytes"]))
+    c2.metric("Threads", len(all_rows))
+    c3.metric("Checkpoint Bytes", format_bytes(sum(r["total_bytes"] for r in all_rows)))
+    c4.metric(f"Session State ({len(report['sessions'])} live)",
+              format_bytes(sum(r["total_bytes"] for r in report["sessions"])))
+
+    # 1. Per-thread checkpoints
+    for name, rows in report["graphs"].items():
+        st.subheader(name)
+        if not rows:
+            st.info("No threads yet.")
+            continue
+        st.dataframe([{k: v for k, v in r.items() if k != "largest"} for r in rows], width="stretch")
+        with st.expander("Largest messages"):
+            for r in rows[:5]:
+                st.markdown(f"**{r['thread_id']}**")
+                st.dataframe(r["largest"], width="stretch")
+
+    # 2. Sessions
+    st.subheader("Sessions")
+    own_id = _ctx.session_id if _ctx is not None else None
+    st.dataframe(
+        [{k: v for k, v in r.items() if k != "largest"} | {"this_session": r["session_id"] == own_id}
+         for r in report["sessions"]],
+        width="stretch",
+    )
+    with st.expander("Largest keys per session"):
+        for r in report["sessions"][:10]:
+            st.markdown(f"**{r['session_id']}**")
+            st.dataframe(r["largest"], width="stretch")
+    with st.expander("This session"):
+        st.dataframe(report["session"]["keys"], width="stretch")
+
+    # 3. tracemalloc
+    st.subheader("tracemalloc")
+    profiler = memory_profile.profiler
+    t1, t2, t3 = st.columns(3)
+    if not profiler.running:
+        if t1.button("▶️ Start Tracing"):
+            profiler.start()
+            st.rerun()
+    else:
+        if t1.button("📸 Snapshot Diff"):
+            st.session_state.admin_tracemalloc = profiler.snapshot_diff()
+        if t2.button("⏹️ Stop Tracing"):
+            profiler.stop()
+            st.session_state.pop('admin_tracemalloc', None)
+            st.rerun()
+    diff = st.session_state.get('admin_tracemalloc')
+    if diff:
+        report["tracemalloc"] = diff
+        st.caption(f"Traced: {format_bytes(diff['traced_bytes'])} · Peak: {format_bytes(diff['peak_bytes'])}")
+        st.dataframe(diff["top"], width="stretch")
+
+    # 4. Export
+    st.subheader("Export")
+    st.download_button(
+        "⬇️ Download Report (JSON)",
+        json.dumps(report, indent=2, default=str),
+        file_name=f"memory_report_{int(report['timestamp'])}.json",
+        mime="application/json",
+    )
+    if st.button("💾 Dump Report on Server"):
+        path = memory_profile.dump_report(report)
+        st.success(f"Wrote {path}")
+
+
 # ==============================================================================
 # ROUTER
 # ==============================================================================
@@ -460,3 +759,7 @@ elif st.session_state.current_view == 'demo2':
     render_demo2()
 elif st.session_state.current_view == 'demo3':
     render_demo3_fixed()
+elif st.session_state.current_view == 'demo4':
+    render_demo4()
+elif st.session_state.current_view == 'admin':
+    render_admin()
@@ -0,0 +1,192 @@
+# batch.py
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+from langchain_core.messages import HumanMessage
+from langgraph.types import Command
+
+from deadlines import turn_config
+
+# Guard against a graph that keeps interrupting within one turn
+MAX_INTERRUPTS_PER_TURN = 10
+
+POLICIES = {"approve": "yes", "reject": "no"}
+
+
+# -------------------
+# 1. Inputs
+# -------------------
+def load_conversations(path: str) -> list[dict]:
+    """
+    Read one conversation per JSONL line:
+    {"thread_id": "...", "messages": ["first turn", "second turn", ...]}
+    A single "message" string is accepted as a one-turn conversation.
+    Lines sharing a thread_id are merged into one conversation (turns in file
+    order), since concurrent runs on one checkpoint thread would corrupt it.
+    """
+    conversations: dict[str, dict] = {}
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            turns = row.get("messages") or [row["message"]]
+            thread_id = row.get("thread_id") or f"batch-{lineno}"
+            conversations.setdefault(thread_id, {"thread_id": thread_id, "messages": []})["messages"].extend(turns)
+    return list(conversations.values())
+
+
+class DecisionPolicy:
+    """
+    Answers interrupts for batch runs.
+
+    Per-thread decisions come from a JSONL file of
+    {"thread_id": "...", "decisions": ["yes", "no", ...]} (or "decision": "yes"),
+    used in order; anything not covered falls back to the default policy.
+    """
+
+    def __init__(self, default: str = "reject", decisions: dict[str, list[str]] | None = None):
+        self.default = POLICIES.get(default, default)
+        self._decisions = {k: list(v) for k, v in (decisions or {}).items()}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str | None, default: str = "reject") -> "DecisionPolicy":
+        decisions: dict[str, list[str]] = {}
+        if path:
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    values = row.get("decisions") or [row["decision"]]
+                    decisions.setdefault(row["thread_id"], []).extend(values)
+        return cls(default, decisions)
+
+    def decide(self, thread_id: str, prompt) -> str:
+        with self._lock:
+            queue = self._decisions.get(thread_id)
+            return queue.pop(0) if queue else self.default
+
+
+# -------------------
+# 2. Runner
+# -------------------
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self._f = open(path, "w")
+        self._lock = threading.Lock()
+
+    def write(self, row: dict):
+        line = json.dumps(row, ensure_ascii=False, default=str)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def run_conversation(chatbot, convo: dict, policy: DecisionPolicy, emit: Callable[[dict], None],
+                     claim: Callable[[str], object] | None = None) -> list[dict]:
+    """Run every turn of one conversation in order; returns the emitted rows."""
+    thread_id = convo["thread_id"]
+    rows = []
+    for turn, text in enumerate(convo["messages"]):
+        row = {"thread_id": thread_id, "turn": turn, "input": text, "interrupts": []}
+        start = time.perf_counter()
+        try:
+            result = chatbot.invoke({"messages": [HumanMessage(content=text)]}, config=turn_config(thread_id))
+            for _ in range(MAX_INTERRUPTS_PER_TURN):
+                interrupts = result.get("__interrupt__", [])
+                if not interrupts:
+                    break
+                decision = policy.decide(thread_id, interrupts[0].value)
+                row["interrupts"].append({"prompt": interrupts[0].value, "decision": decision})
+                # Skip the resume if something else (e.g. the expiry sweeper) got there first
+                if claim is not None and claim(thread_id) is None:
+                    result = chatbot.get_state(turn_config(thread_id)).values
+                    break
+                result = chatbot.invoke(Command(resume=decision), config=turn_config(thread_id))
+            row["output"] = result["messages"][-1].content
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        row["latency_ms"] = round(elapsed * 1000, 1)
+        rows.append(row)
+        emit(row)
+    return rows
+
+
+def run_batch(chatbot, conversations: list[dict], out_path: str, workers: int = 4,
+              policy: DecisionPolicy | None = None, claim: Callable[[str], object] | None = None) -> dict:
+    """Run conversations concurrently and stream one JSONL row per turn to `out_path`."""
+    policy = policy or DecisionPolicy()
+    writer = _JsonlWriter(out_path)
+    latencies: list[float] = []
+    turns = failed_turns = failed_conversations = 0
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            futures = [
+                pool.submit(run_conversation, chatbot, convo, policy, writer.write, claim)
+                for convo in conversations
+            ]
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except Exception:
+                    failed_conversations += 1
+                    continue
+                # Turn errors are caught per row, so count them from the rows
+                failed = [r for r in rows if "error" in r]
+                turns += len(rows)
+                failed_turns += len(failed)
+                failed_conversations += bool(failed)
+                latencies.extend(r["latency_ms"] / 1000 for r in rows if "error" not in r)
+    finally:
+        writer.close()
+
+    wall = time.perf_counter() - start
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 1) if ordered else None
+
+    return {
+        "conversations": len(conversations),
+        "turns": turns,
+        "failed_turns": failed_turns,
+        "failed_conversations": failed_conversations,
+        "wall_seconds": round(wall, 2),
+        # Throughput and percentiles cover successful turns only
+        "turns_per_second": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+    }
+
+
+# -------------------
+# 3. CLI
+# -------------------
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stock bot CLI (interactive by default).")
+    parser.add_argument("--batch", metavar="JSONL", help="conversations to run, one thread_id per line")
+    parser.add_argument("--out", metavar="JSONL", default="batch_results.jsonl", help="where to stream per-turn results")
+    parser.add_argument("--workers", type=int, default=4, help="conversations run concurrently")
+    parser.add_argument("--decisions", metavar="JSONL", help="per-thread answers to approval interrupts")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="reject",
+                        help="answer for interrupts not covered by --decisions")
+    return parser.parse_args(argv)
+
+
+def run_batch_cli(chatbot, args: argparse.Namespace, claim: Callable[[str], object] | None = None):
+    conversations = load_conversations(args.batch)
+    policy = DecisionPolicy.from_file(args.decisions, default=args.policy)
+    summary = run_batch(chatbot, conversations, args.out, workers=args.workers, policy=policy, claim=claim)
+    print(json.dumps(summary, indent=2))
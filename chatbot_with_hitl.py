@@ -1,43 +1,78 @@
 # backend.py
 
-from langgraph.graph import StateGraph, START
+from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import interrupt, Command
 from dotenv import load_dotenv
 import requests
+import json
+
+from deadlines import (
+    LLM_MAX_RETRIES, LLM_REQUEST_TIMEOUT, DeadlineExceeded, invoke_with_deadline, remaining, turn_config,
+)
+from intent_router import QuoteIntentRouter
+from interrupt_store import PendingInterruptStore
+from order_ledger import OrderLedger, idempotency_key, ledger_path, order_id_for
+from price_history import price_history_summary
+from quotes import parse_quote_price
+from speculation import ApprovalPreview, ApprovalSpeculator
+from watchlist import get_quote, refresher as watchlist_refresher
 
 load_dotenv()
 
 # -------------------
 # 1. LLM
 # -------------------
-llm = ChatOpenAI()
+llm = ChatOpenAI(timeout=LLM_REQUEST_TIMEOUT, max_retries=LLM_MAX_RETRIES)
 
 # -------------------
 # 2. Tools
 # -------------------
+# Index of threads waiting on approval; expired ones are auto-resumed below
+pending_interrupts = PendingInterruptStore()
+# Every placed order is recorded here; set ORDER_LEDGER_DIR to persist it
+ledger = OrderLedger(ledger_path("orders_hitl"))
+
 @tool
-def get_stock_price(symbol: str) -> dict:
+def get_stock_price(symbol: str, config: RunnableConfig) -> dict:
     """
     Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
     using Alpha Vantage with API key in the URL.
     """
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
-    )
-    r = requests.get(url)
-    return r.json()
+    timeout = remaining(config)
+    if timeout is not None and timeout <= 0:
+        return {"error": f"Timed out before fetching a quote for {symbol}."}
+
+    # Watched symbols come from memory; others from the host-wide quote table
+    # when another process fetched them recently, else from the network
+    try:
+        return get_quote(symbol, timeout=timeout)
+    except requests.Timeout:
+        return {"error": f"Timed out while fetching a quote for {symbol}."}
+
+
+def current_price(symbol: str, config: RunnableConfig) -> float | None:
+    """Price to record with an order, or None if no quote arrives in time."""
+    try:
+        return parse_quote_price(get_stock_price.invoke({"symbol": symbol}, config))
+    except requests.RequestException:
+        return None
 
 
 @tool
-def purchase_stock(symbol: str, quantity: int) -> dict:
+def purchase_stock(
+    symbol: str,
+    quantity: int,
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> dict:
     """
     Simulate purchasing a given quantity of a stock symbol.
 
@@ -45,27 +80,78 @@ def purchase_stock(symbol: str, quantity: int) -> dict:
     Before confirming the purchase, this tool will interrupt
     and wait for a human decision ("yes" / anything else).
     """
+    thread_id = config["configurable"]["thread_id"]
+    prompt = f"Approve buying {quantity} shares of {symbol}? (yes/no)"
+    pending_interrupts.add(thread_id, prompt, symbol=symbol)
+
     # This pauses the graph and returns control to the caller
-    decision = interrupt(f"Approve buying {quantity} shares of {symbol}? (yes/no)")
+    decision = interrupt(prompt)
+    pending_interrupts.discard(thread_id)
 
     if isinstance(decision, str) and decision.lower() == "yes":
-        return {
-            "status": "success",
-            "message": f"Purchase order placed for {quantity} shares of {symbol}.",
-            "symbol": symbol,
-            "quantity": quantity,
-        }
+        key = idempotency_key(thread_id, tool_call_id)
+        price = None
+        if ledger.get(key) is None:
+            # The quote prefetched while the human was deciding saves a lookup
+            preview = speculator.get(thread_id)
+            price = preview.price if preview and preview.tool_call_id == tool_call_id else None
+            if price is None:
+                price = current_price(symbol, config)
+        # Replays of the same tool call return the original order
+        order, _ = ledger.record(key, symbol, quantity, price=price)
+        return purchase_result(True, symbol, quantity, order.order_id, order.price)
     
     else:
-        return {
-            "status": "cancelled",
-            "message": f"Purchase of {quantity} shares of {symbol} was declined by human.",
+        return purchase_result(False, symbol, quantity)
+
+
+def purchase_result(approved: bool, symbol: str, quantity: int, order_id: str | None = None, price: float | None = None) -> dict:
+    """Payload returned by purchase_stock (also used to predict it)."""
+    if approved:
+        result = {
+            "status": "success",
+            "message": f"Purchase order placed for {quantity} shares of {symbol}.",
             "symbol": symbol,
             "quantity": quantity,
+            "order_id": order_id,
         }
+        if price is not None:
+            result["price"] = price
+            result["notional"] = round(price * quantity, 2)
+        return result
+
+    return {
+        "status": "cancelled",
+        "message": f"Purchase of {quantity} shares of {symbol} was declined by human.",
+        "symbol": symbol,
+        "quantity": quantity,
+    }
+
+
+@tool
+def get_price_history(symbol: str, config: RunnableConfig, days: int = 30, sma_window: int = 50) -> dict:
+    """
+    Summarise daily price history for a stock symbol: return over the last
+    `days` trading days, high/low, annualized volatility and moving averages
+    (20-day, 50-day and `sma_window`-day). Use this for questions about
+    trends, averages or how much a stock moved over a period.
+    """
+    timeout = remaining(config)
+    if timeout is not None and timeout <= 0:
+        return {"error": f"Timed out before fetching price history for {symbol}."}
+    return price_history_summary(symbol, days=days, sma_window=sma_window, timeout=timeout)
+
+
+@tool
+def get_portfolio(config: RunnableConfig) -> dict:
+    """
+    Return the current holdings (shares and cost basis per symbol)
+    built from the purchase orders placed in this conversation.
+    """
+    return ledger.portfolio(config["configurable"]["thread_id"])
 
 
-tools = [get_stock_price, purchase_stock]
+tools = [get_stock_price, get_price_history, purchase_stock, get_portfolio]
 llm_with_tools = llm.bind_tools(tools)
 
 # -------------------
@@ -77,14 +163,29 @@ class ChatState(TypedDict):
 # -------------------
 # 4. Nodes
 # -------------------
-def chat_node(state: ChatState):
+def chat_node(state: ChatState, config: RunnableConfig):
     """LLM node that may answer or request a tool call."""
     messages = state["messages"]
-    response = llm_with_tools.invoke(messages)
+
+    # Right after an approval, reuse the continuation built while waiting
+    response = speculator.take_continuation(config["configurable"].get("thread_id"), messages)
+    if response is not None:
+        return {"messages": [response]}
+
+    try:
+        response = invoke_with_deadline(llm_with_tools, messages, config)
+    except DeadlineExceeded:
+        # Degrade cleanly: end the turn with a plain answer instead of hanging
+        response = AIMessage(
+            content="Sorry, that took too long to answer. Please try again in a moment."
+        )
     return {"messages": [response]}
 
 tool_node = ToolNode(tools)
 
+# Answers plain "price of AAPL" requests without the two LLM round trips
+intent_router = QuoteIntentRouter(get_stock_price)
+
 # -------------------
 # 5. Checkpointer (in-memory)
 # -------------------
@@ -94,21 +195,102 @@ memory = MemorySaver()
 # 6. Graph
 # -------------------
 graph = StateGraph(ChatState)
+graph.add_node("route", intent_router.route)
 graph.add_node("chat_node", chat_node)
 graph.add_node("tools", tool_node)
 
-graph.add_edge(START, "chat_node")
+graph.add_edge(START, "route")
+graph.add_conditional_edges("route", intent_router.next_step, ["chat_node", END])
 
 graph.add_conditional_edges("chat_node", tools_condition)
 graph.add_edge("tools", "chat_node")
 
 chatbot = graph.compile(checkpointer=memory)
 
+# Keep watched symbols warm in the background
+watchlist_refresher.start()
+
+
+def _auto_resume(thread_id: str, decision: str):
+    """Resume an abandoned approval so its thread state is released."""
+    chatbot.invoke(Command(resume=decision), config=turn_config(thread_id))
+
+
+pending_interrupts.start_sweeper(_auto_resume)
+
+
+# -------------------
+# 7. Speculation while waiting on approval
+# -------------------
+def _speculate(preview: ApprovalPreview):
+    """Prefetch the quote, then pre-build the LLM reply for both decisions."""
+    config = turn_config(preview.thread_id)
+    preview.price = current_price(preview.symbol, config)
+    if preview.price is not None:
+        preview.notional = round(preview.price * preview.quantity, 2)
+    preview.quote_ready.set()
+    if not preview.messages:
+        return
+
+    order_id = order_id_for(idempotency_key(preview.thread_id, preview.tool_call_id))
+    predicted = {
+        "yes": purchase_result(True, preview.symbol, preview.quantity, order_id, preview.price),
+        "no": purchase_result(False, preview.symbol, preview.quantity),
+    }
+    branches = [
+        preview.messages + [ToolMessage(
+            content=json.dumps(result, ensure_ascii=False),
+            tool_call_id=preview.tool_call_id,
+            name="purchase_stock",
+        )]
+        for result in predicted.values()
+    ]
+    # Both branches run concurrently; only one will ever be used
+    responses = llm_with_tools.batch(branches, config)
+    for decision, branch, response in zip(predicted, branches, responses):
+        preview.continuations[decision] = (branch[-1].content, response)
+
+
+speculator = ApprovalSpeculator(_speculate)
+
+
+def prepare_approval(thread_id: str) -> ApprovalPreview | None:
+    """
+    Start speculative work for a thread paused on purchase_stock.
+
+    Call this right after an invoke returns an interrupt; the approval panel
+    can then show `preview.price` / `preview.notional`.
+    """
+    state = chatbot.get_state(turn_config(thread_id))
+    messages = state.values.get("messages", [])
+    last = messages[-1] if messages else None
+    calls = getattr(last, "tool_calls", None) or []
+    purchase = next((c for c in calls if c["name"] == "purchase_stock"), None)
+    if purchase is None:
+        return None
+
+    preview = ApprovalPreview(
+        thread_id=thread_id,
+        tool_call_id=purchase["id"],
+        symbol=purchase["args"]["symbol"],
+        quantity=purchase["args"]["quantity"],
+        # Continuations are only predictable when purchase is the sole tool call
+        messages=list(messages) if len(calls) == 1 else [],
+    )
+    return speculator.start(preview)
+
 # -------------------
-# 7. Simple usage example (CLI with HITL)
+# 8. Simple usage example (CLI with HITL)
 # -------------------
 if __name__ == "__main__":
-    
+    from batch import parse_args, run_batch_cli
+
+    # --batch runs many conversations concurrently instead of the chat loop
+    args = parse_args()
+    if args.batch:
+        run_batch_cli(chatbot, args, claim=pending_interrupts.claim)
+        raise SystemExit(0)
+
     # Use a fixed thread_id so the conversation is persisted in memory
     thread_id = "demo-thread"
 
@@ -124,7 +306,7 @@ if __name__ == "__main__":
         # Run the graph (may hit an interrupt)
         result = chatbot.invoke(
             state,
-            config={"configurable": {"thread_id": thread_id}},
+            config=turn_config(thread_id),
         )
 
         # Check for HITL interrupt from purchase_stock
@@ -134,13 +316,21 @@ if __name__ == "__main__":
             # Our interrupt payload is the string we passed to interrupt(...)
             prompt_to_human = interrupts[0].value
             print(f"HITL: {prompt_to_human}")
+            preview = prepare_approval(thread_id)
+            if preview is not None and preview.quote_ready.wait(timeout=5) and preview.notional is not None:
+                print(f"HITL: ~${preview.price:,.2f}/share, ~${preview.notional:,.2f} total")
             decision = input("Your decision: ").strip().lower()
 
-            # Resume graph with the human decision ("yes" / "no" / whatever)
-            result = chatbot.invoke(
-                Command(resume=decision),
-                config={"configurable": {"thread_id": thread_id}},
-            )
+            # Resume graph with the human decision ("yes" / "no" / whatever),
+            # unless the expiry sweeper already resumed it with the default
+            if pending_interrupts.claim(thread_id) is not None:
+                result = chatbot.invoke(
+                    Command(resume=decision),
+                    config=turn_config(thread_id),
+                )
+            else:
+                print("HITL: approval expired and was resolved automatically.")
+                result = chatbot.get_state(turn_config(thread_id)).values
 
         # Get the latest message from the assistant
         messages = result["messages"]
@@ -2,57 +2,120 @@
 
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolCallId
 from dotenv import load_dotenv
 import requests
 
+from deadlines import (
+    LLM_MAX_RETRIES, LLM_REQUEST_TIMEOUT, DeadlineExceeded, invoke_with_deadline, remaining, turn_config,
+)
+from intent_router import QuoteIntentRouter
+from order_ledger import OrderLedger, idempotency_key, ledger_path
+from price_history import price_history_summary
+from quotes import parse_quote_price
+from watchlist import get_quote, refresher as watchlist_refresher
+
 load_dotenv()
 
 # -------------------
 # 1. LLM
 # -------------------
-llm = ChatOpenAI()
+llm = ChatOpenAI(timeout=LLM_REQUEST_TIMEOUT, max_retries=LLM_MAX_RETRIES)
 
 # -------------------
 # 2. Tools
 # -------------------
+# Every placed order is recorded here; set ORDER_LEDGER_DIR to persist it
+ledger = OrderLedger(ledger_path("orders_no_hitl"))
+
 @tool
-def get_stock_price(symbol: str) -> dict:
+def get_stock_price(symbol: str, config: RunnableConfig) -> dict:
     """
     Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
     using Alpha Vantage with API key in the URL.
     """
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
-    )
-    r = requests.get(url)
-    return r.json()
+    timeout = remaining(config)
+    if timeout is not None and timeout <= 0:
+        return {"error": f"Timed out before fetching a quote for {symbol}."}
+
+    # Watched symbols come from memory; others from the host-wide quote table
+    # when another process fetched them recently, else from the network
+    try:
+        return get_quote(symbol, timeout=timeout)
+    except requests.Timeout:
+        return {"error": f"Timed out while fetching a quote for {symbol}."}
+
+
+def current_price(symbol: str, config: RunnableConfig) -> float | None:
+    """Price to record with an order, or None if no quote arrives in time."""
+    try:
+        return parse_quote_price(get_stock_price.invoke({"symbol": symbol}, config))
+    except requests.RequestException:
+        return None
 
 
 @tool
-def purchase_stock(symbol: str, quantity: int) -> dict:
+def purchase_stock(
+    symbol: str,
+    quantity: int,
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> dict:
     """
     Simulate purchasing a given quantity of a stock symbol.
 
     NOTE: This is a mock implementation:
     - No real brokerage API is called.
-    - It simply returns a confirmation payload.
+    - The order is recorded in the in-memory ledger and a
+      confirmation payload is returned.
     """
-    return {
+    # Replays of the same tool call return the original order
+    key = idempotency_key(config["configurable"]["thread_id"], tool_call_id)
+    price = current_price(symbol, config) if ledger.get(key) is None else None
+    order, _ = ledger.record(key, symbol, quantity, price=price)
+    result = {
         "status": "success",
         "message": f"Purchase order placed for {quantity} shares of {symbol}.",
         "symbol": symbol,
         "quantity": quantity,
+        "order_id": order.order_id,
     }
+    if order.price is not None:
+        result["price"] = order.price
+        result["notional"] = round(order.price * quantity, 2)
+    return result
+
+
+@tool
+def get_price_history(symbol: str, config: RunnableConfig, days: int = 30, sma_window: int = 50) -> dict:
+    """
+    Summarise daily price history for a stock symbol: return over the last
+    `days` trading days, high/low, annualized volatility and moving averages
+    (20-day, 50-day and `sma_window`-day). Use this for questions about
+    trends, averages or how much a stock moved over a period.
+    """
+    timeout = remaining(config)
+    if timeout is not None and timeout <= 0:
+        return {"error": f"Timed out before fetching price history for {symbol}."}
+    return price_history_summary(symbol, days=days, sma_window=sma_window, timeout=timeout)
 
 
-tools = [get_stock_price, purchase_stock]
+@tool
+def get_portfolio(config: RunnableConfig) -> dict:
+    """
+    Return the current holdings (shares and cost basis per symbol)
+    built from the purchase orders placed in this conversation.
+    """
+    return ledger.portfolio(config["configurable"]["thread_id"])
+
+
+tools = [get_stock_price, get_price_history, purchase_stock, get_portfolio]
 llm_with_tools = llm.bind_tools(tools)
 
 # -------------------
@@ -64,14 +127,23 @@ class ChatState(TypedDict):
 # -------------------
 # 4. Nodes
 # -------------------
-def chat_node(state: ChatState):
+def chat_node(state: ChatState, config: RunnableConfig):
     """LLM node that may answer or request a tool call."""
     messages = state["messages"]
-    response = llm_with_tools.invoke(messages)
+    try:
+        response = invoke_with_deadline(llm_with_tools, messages, config)
+    except DeadlineExceeded:
+        # Degrade cleanly: end the turn with a plain answer instead of hanging
+        response = AIMessage(
+            content="Sorry, that took too long to answer. Please try again in a moment."
+        )
     return {"messages": [response]}
 
 tool_node = ToolNode(tools)
 
+# Answers plain "price of AAPL" requests without the two LLM round trips
+intent_router = QuoteIntentRouter(get_stock_price)
+
 # -------------------
 # 5. Checkpointer (in-memory)
 # -------------------
@@ -81,21 +153,34 @@ memory = MemorySaver()
 # 6. Graph
 # -------------------
 graph = StateGraph(ChatState)
+graph.add_node("route", intent_router.route)
 graph.add_node("chat_node", chat_node)
 graph.add_node("tools", tool_node)
 
-graph.add_edge(START, "chat_node")
+graph.add_edge(START, "route")
+graph.add_conditional_edges("route", intent_router.next_step, ["chat_node", END])
 
 graph.add_conditional_edges("chat_node", tools_condition)
 graph.add_edge("tools", "chat_node")
 
 chatbot = graph.compile(checkpointer=memory)
 
+# Keep watched symbols warm in the background
+watchlist_refresher.start()
+
 # -------------------
 # 7. Simple usage example (CLI)
 # -------------------
 if __name__ == "__main__":
-    print("📈 Stock Bot with Tools (get_stock_price, purchase_stock)")
+    from batch import parse_args, run_batch_cli
+
+    # --batch runs many conversations concurrently instead of the chat loop
+    args = parse_args()
+    if args.batch:
+        run_batch_cli(chatbot, args)
+        raise SystemExit(0)
+
+    print("📈 Stock Bot with Tools (get_stock_price, purchase_stock, get_portfolio)")
     print("Type 'exit' to quit.\n")
 
     # thread_id still works with MemorySaver (conversation kept in RAM)
@@ -113,7 +198,7 @@ if __name__ == "__main__":
         # Run the graph
         result = chatbot.invoke(
             state,
-            config={"configurable": {"thread_id": thread_id}},
+            config=turn_config(thread_id),
         )
 
         # Get the latest message from the assistant
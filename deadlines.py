@@ -0,0 +1,134 @@
+# deadlines.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# -------------------
+# 1. Settings
+# -------------------
+# Seconds a single turn (user message -> final answer) may take end to end.
+DEFAULT_TURN_TIMEOUT = float(os.getenv("TURN_TIMEOUT_SECONDS", "30"))
+
+# Fire a duplicate LLM request once the first one is slower than this
+# percentile of recently observed latencies. Off unless HEDGE_LLM=1.
+HEDGE_ENABLED = os.getenv("HEDGE_LLM", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 20
+
+# Client-level limits for the chat model; each call is further capped to the
+# turn's remaining budget so abandoned calls don't hold a worker
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", str(DEFAULT_TURN_TIMEOUT)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+# Sized for concurrent batch runs, not just one interactive session
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_CALL_WORKERS", "32")), thread_name_prefix="llm-call"
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call cannot finish before the turn deadline."""
+
+
+# -------------------
+# 2. Config helpers
+# -------------------
+def turn_config(thread_id: str, timeout: float | None = None, hedge: bool | None = None) -> dict:
+    """Build a graph config for one turn, carrying an absolute deadline."""
+    timeout = DEFAULT_TURN_TIMEOUT if timeout is None else timeout
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "deadline": time.time() + timeout,
+            "hedge": HEDGE_ENABLED if hedge is None else hedge,
+        }
+    }
+
+
+def remaining(config: dict | None) -> float | None:
+    """Seconds left before the turn deadline, or None if the turn has none."""
+    deadline = ((config or {}).get("configurable") or {}).get("deadline")
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+# -------------------
+# 3. Latency tracking
+# -------------------
+class LatencyTracker:
+    """Rolling window of call latencies (seconds)."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        return len(self._samples)
+
+    def mean(self) -> float | None:
+        with self._lock:
+            samples = list(self._samples)
+        return sum(samples) / len(samples) if samples else None
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+
+llm_latency = LatencyTracker()
+
+
+# -------------------
+# 4. Deadline-aware invoke
+# -------------------
+def invoke_with_deadline(runnable, messages, config: dict | None = None):
+    """
+    Invoke `runnable` so it returns before the turn deadline.
+
+    If hedging is enabled for this turn and the first request is slower than
+    the tracked latency percentile, a duplicate request is started and
+    whichever finishes first wins. Every request (hedges included) is sent
+    with a timeout of the budget left when it starts, so a stalled upstream
+    can't keep pool workers busy past the deadline. Raises DeadlineExceeded
+    on timeout.
+    """
+    budget = remaining(config)
+    if budget is not None and budget <= 0:
+        raise DeadlineExceeded("turn deadline already passed")
+
+    def call():
+        # Measured when the worker picks the call up, not when it was queued
+        left = remaining(config)
+        if left is not None and left <= 0:
+            raise DeadlineExceeded("turn deadline passed while the call was queued")
+        start = time.perf_counter()
+        result = runnable.invoke(messages, config) if left is None else runnable.invoke(messages, config, timeout=left)
+        llm_latency.record(time.perf_counter() - start)
+        return result
+
+    pending = {_executor.submit(call)}
+
+    hedge = ((config or {}).get("configurable") or {}).get("hedge", False)
+    hedge_after = llm_latency.percentile(HEDGE_PERCENTILE)
+    if hedge and hedge_after is not None and llm_latency.count() >= HEDGE_MIN_SAMPLES:
+        first_wait = hedge_after if budget is None else min(hedge_after, budget)
+        done, _ = wait(pending, timeout=first_wait)
+        if not done:
+            pending.add(_executor.submit(call))
+
+    done, _ = wait(pending, timeout=remaining(config), return_when=FIRST_COMPLETED)
+    if not done:
+        raise DeadlineExceeded("LLM call did not finish before the turn deadline")
+    return done.pop().result()
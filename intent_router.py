@@ -0,0 +1,161 @@
+# intent_router.py
+
+import json
+import re
+import threading
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
+
+from deadlines import llm_latency
+
+# -------------------
+# 1. Symbol index
+# -------------------
+# Company names users type instead of tickers
+NAME_TO_SYMBOL = {
+    "apple": "AAPL",
+    "tesla": "TSLA",
+    "microsoft": "MSFT",
+    "google": "GOOGL",
+    "alphabet": "GOOGL",
+    "amazon": "AMZN",
+    "nvidia": "NVDA",
+    "meta": "META",
+    "facebook": "META",
+    "netflix": "NFLX",
+    "ibm": "IBM",
+}
+KNOWN_SYMBOLS = set(NAME_TO_SYMBOL.values())
+
+_SYM = r"(?P<sym>\$?[A-Za-z][A-Za-z.]{0,9})"
+_STOCK = r"(?:\s+(?:stock|shares?))?"
+
+# Whole-message patterns only: anything with extra words falls through to the LLM
+QUOTE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        rf"^(?:what(?:'s| is)\s+)?(?:the\s+)?(?:current\s+|latest\s+)?(?:stock\s+|share\s+)?(?:price|quote)\s+(?:of|for)\s+{_SYM}{_STOCK}$",
+        rf"^{_SYM}{_STOCK}\s+(?:price|quote)(?:\s+now)?$",
+        rf"^what(?:'s| is)\s+{_SYM}{_STOCK}\s+(?:trading at|worth)(?:\s+now)?$",
+        rf"^how much is\s+{_SYM}{_STOCK}(?:\s+(?:trading at|worth))?(?:\s+now)?$",
+        rf"^(?:quote|price)\s*:?\s*{_SYM}$",
+    )
+]
+_FILLER = re.compile(r"^(?:please\s+|hey\s+|hi\s+)*|(?:\s+please)?[\s?.!]*$", re.IGNORECASE)
+
+
+def match_quote_intent(text: str) -> str | None:
+    """Return the ticker if `text` is unambiguously a plain quote request."""
+    text = _FILLER.sub("", text.strip())
+    for pattern in QUOTE_PATTERNS:
+        m = pattern.match(text)
+        if m:
+            return resolve_symbol(m.group("sym"))
+    return None
+
+
+def resolve_symbol(token: str) -> str | None:
+    if token.lower() in NAME_TO_SYMBOL:
+        return NAME_TO_SYMBOL[token.lower()]
+    if token.startswith("$"):
+        return token[1:].upper()
+    # Bare words only count as tickers when typed in caps or already known
+    if token.isupper() or token.upper() in KNOWN_SYMBOLS:
+        return token.upper()
+    return None
+
+
+def render_quote(symbol: str, result: dict) -> str | None:
+    """Templated answer for a GLOBAL_QUOTE payload, or None if it has no price."""
+    quote = result.get("Global Quote") or {}
+    price = quote.get("05. price")
+    if not price:
+        return None
+    text = f"**{symbol}** is trading at **${float(price):,.2f}**"
+    change, pct = quote.get("09. change"), quote.get("10. change percent")
+    if change and pct:
+        text += f" ({float(change):+,.2f}, {pct})"
+    day = quote.get("07. latest trading day")
+    if day:
+        text += f" as of {day}"
+    return text + "."
+
+
+# -------------------
+# 2. Router node
+# -------------------
+class QuoteIntentRouter:
+    """
+    Pre-routing node that answers simple quote requests without the LLM.
+
+    A match calls the quote tool directly and appends the same tool-call /
+    tool-result / answer messages the LLM path would produce, so later turns
+    see a normal history. Everything else goes on to `chat_node`.
+    """
+
+    def __init__(self, quote_tool):
+        self.quote_tool = quote_tool
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0     # matched, but the quote could not be rendered
+        self.fast_path_seconds = 0.0
+
+    def route(self, state: dict, config: RunnableConfig):
+        last = state["messages"][-1]
+        symbol = match_quote_intent(last.content) if isinstance(last, HumanMessage) else None
+        if symbol is None:
+            self._count("misses")
+            return {}
+
+        start = time.perf_counter()
+        call_id = f"fastpath_{uuid.uuid4().hex[:12]}"
+        result = self.quote_tool.invoke({"symbol": symbol}, config)
+        answer = render_quote(symbol, result) if isinstance(result, dict) else None
+        if answer is None:
+            self._count("fallbacks")
+            return {}
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.hits += 1
+            self.fast_path_seconds += elapsed
+        return {
+            "messages": [
+                AIMessage(content="", tool_calls=[{"name": self.quote_tool.name, "args": {"symbol": symbol}, "id": call_id}]),
+                ToolMessage(content=json.dumps(result, ensure_ascii=False), tool_call_id=call_id, name=self.quote_tool.name),
+                AIMessage(content=answer),
+            ]
+        }
+
+    def next_step(self, state: dict) -> str:
+        """Conditional edge: END if the fast path answered, else the LLM."""
+        last = state["messages"][-1]
+        if isinstance(last, AIMessage) and not last.tool_calls:
+            return END
+        return "chat_node"
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        """Hit rate and the LLM time saved (two round trips per hit)."""
+        total = self.hits + self.misses + self.fallbacks
+        avg_llm = llm_latency.mean()
+        saved = None
+        if avg_llm is not None:
+            saved = self.hits * 2 * avg_llm - self.fast_path_seconds
+        return {
+            "requests": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hits / total if total else 0.0,
+            "avg_fast_path_ms": 1000 * self.fast_path_seconds / self.hits if self.hits else None,
+            "estimated_seconds_saved": round(saved, 2) if saved is not None else None,
+        }
@@ -0,0 +1,138 @@
+# interrupt_store.py
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Settings
+# -------------------
+# How long an approval may wait before it is resumed automatically.
+APPROVAL_TTL_SECONDS = float(os.getenv("APPROVAL_TTL_SECONDS", "900"))
+# Decision used when an approval expires ("no" releases the order safely).
+APPROVAL_DEFAULT_DECISION = os.getenv("APPROVAL_DEFAULT_DECISION", "no")
+
+
+# -------------------
+# 2. Store
+# -------------------
+@dataclass
+class PendingInterrupt:
+    """One thread waiting on a human decision."""
+    thread_id: str
+    payload: Any
+    symbol: str | None = None
+    created_at: float = field(default_factory=time.time)
+
+    def age(self, now: float | None = None) -> float:
+        return (now or time.time()) - self.created_at
+
+
+class PendingInterruptStore:
+    """
+    Secondary index of threads paused on `interrupt(...)`, keyed by thread_id.
+
+    Entries are kept in creation order, so expired ones are always at the
+    front and the sweeper never scans live entries.
+    """
+
+    def __init__(self, ttl: float = APPROVAL_TTL_SECONDS, default_decision: str = APPROVAL_DEFAULT_DECISION):
+        self.ttl = ttl
+        self.default_decision = default_decision
+        self._items: OrderedDict[str, PendingInterrupt] = OrderedDict()
+        self._by_symbol: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: threading.Thread | None = None
+
+    def add(self, thread_id: str, payload: Any, symbol: str | None = None) -> PendingInterrupt:
+        """Register a pending interrupt. Re-adding keeps the original entry."""
+        with self._lock:
+            entry = self._items.get(thread_id)
+            if entry is None:
+                entry = PendingInterrupt(thread_id, payload, symbol)
+                self._items[thread_id] = entry
+                if symbol:
+                    self._by_symbol[symbol] += 1
+            return entry
+
+    def get(self, thread_id: str) -> PendingInterrupt | None:
+        return self._items.get(thread_id)
+
+    def claim(self, thread_id: str) -> PendingInterrupt | None:
+        """Remove and return the entry; only the caller that gets it may resume."""
+        with self._lock:
+            entry = self._items.pop(thread_id, None)
+            if entry is not None:
+                self._forget_symbol(entry)
+            return entry
+
+    discard = claim
+
+    def list_all(self) -> list[PendingInterrupt]:
+        with self._lock:
+            return list(self._items.values())
+
+    def count(self, symbol: str | None = None) -> int:
+        if symbol is None:
+            return len(self._items)
+        return self._by_symbol.get(symbol, 0)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self._items
+
+    def pop_expired(self, now: float | None = None) -> list[PendingInterrupt]:
+        """Claim every entry older than the TTL."""
+        now = now or time.time()
+        expired = []
+        with self._lock:
+            while self._items:
+                entry = next(iter(self._items.values()))
+                if entry.age(now) < self.ttl:
+                    break
+                expired.append(entry)
+                del self._items[entry.thread_id]
+                self._forget_symbol(entry)
+        return expired
+
+    def _forget_symbol(self, entry: PendingInterrupt):
+        if entry.symbol:
+            self._by_symbol[entry.symbol] -= 1
+            if self._by_symbol[entry.symbol] <= 0:
+                del self._by_symbol[entry.symbol]
+
+    # -------------------
+    # 3. Background sweeper
+    # -------------------
+    def start_sweeper(self, resume: Callable[[str, str], Any], interval: float | None = None):
+        """
+        Periodically resume expired interrupts with `resume(thread_id, decision)`
+        using the default decision, so abandoned threads are released.
+        """
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        interval = interval or min(30.0, self.ttl)
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                for entry in self.pop_expired():
+                    try:
+                        resume(entry.thread_id, self.default_decision)
+                    except Exception:
+                        logger.exception("Failed to auto-resume thread %s", entry.thread_id)
+
+        self._sweeper = threading.Thread(target=run, name="interrupt-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
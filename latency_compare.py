@@ -0,0 +1,208 @@
+# latency_compare.py
+
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+
+from langchain_core.messages import HumanMessage
+from langgraph.types import Command
+
+from deadlines import turn_config
+
+# Timeline lane for each graph node
+NODE_KINDS = {"route": "Router", "chat_node": "LLM", "tools": "Tools"}
+WAIT = "Interrupt Wait"
+
+LATENCY_LOG_PATH = os.getenv("LATENCY_LOG_PATH")
+
+
+# -------------------
+# 1. Timelines
+# -------------------
+@dataclass
+class TimelineEvent:
+    node: str
+    kind: str
+    start: float  # seconds since the run started
+    end: float
+    phase: str = "run"  # "run" or "resume"
+
+
+@dataclass
+class RunTimeline:
+    """Per-node timing of one prompt through one graph."""
+    graph: str
+    thread_id: str
+    prompt: str
+    started_at: float = field(default_factory=time.time)
+    events: list[TimelineEvent] = field(default_factory=list)
+    interrupted_at: float | None = None
+    interrupt: str | None = None
+    decision: str | None = None
+    finished_at: float | None = None
+    output: str | None = None
+    error: str | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def waiting(self) -> bool:
+        return self.interrupted_at is not None and self.decision is None and self.error is None
+
+    def rows(self, now: float | None = None) -> list[dict]:
+        """Chart rows (milliseconds), including the interrupt wait so far."""
+        rows = [
+            {"graph": self.graph, "node": e.node, "kind": e.kind, "phase": e.phase,
+             "start_ms": e.start * 1000, "end_ms": e.end * 1000}
+            for e in list(self.events)
+        ]
+        if self.interrupted_at is not None and not any(e.kind == WAIT for e in self.events):
+            end = (now or time.time()) - self.started_at
+            rows.append({"graph": self.graph, "node": "interrupt", "kind": WAIT, "phase": "run",
+                         "start_ms": (self.interrupted_at - self.started_at) * 1000, "end_ms": end * 1000})
+        return rows
+
+    def summary(self) -> dict:
+        """Totals per lane for the history/aggregate table."""
+        by_kind: dict[str, float] = {}
+        for e in self.events:
+            by_kind[e.kind] = by_kind.get(e.kind, 0.0) + (e.end - e.start)
+        total = (self.finished_at or time.time()) - self.started_at
+        wait = by_kind.get(WAIT, 0.0)
+        return {
+            "graph": self.graph,
+            "timestamp": self.started_at,
+            "prompt": self.prompt,
+            "interrupted": self.interrupted_at is not None,
+            "decision": self.decision,
+            "total_ms": round(total * 1000, 1),
+            "active_ms": round((total - wait) * 1000, 1),
+            "llm_ms": round(by_kind.get("LLM", 0.0) * 1000, 1),
+            "tools_ms": round(by_kind.get("Tools", 0.0) * 1000, 1),
+            "router_ms": round(by_kind.get("Router", 0.0) * 1000, 1),
+            "wait_ms": round(wait * 1000, 1),
+            "llm_calls": sum(1 for e in self.events if e.kind == "LLM"),
+            "error": self.error,
+        }
+
+
+def _stream(chatbot, graph_input, timeline: RunTimeline, phase: str):
+    """Stream node updates, closing one timeline event per finished node."""
+    last = time.time()
+    result = None
+    for update in chatbot.stream(graph_input, config=turn_config(timeline.thread_id), stream_mode="updates"):
+        now = time.time()
+        for node, value in update.items():
+            if node == "__interrupt__":
+                # The interrupted node never reports an update; charge its time so far to it
+                timeline.events.append(TimelineEvent(
+                    "tools", NODE_KINDS["tools"], last - timeline.started_at, now - timeline.started_at, phase,
+                ))
+                timeline.interrupted_at = now
+                timeline.interrupt = str(value[0].value) if value else None
+                continue
+            timeline.events.append(TimelineEvent(
+                node, NODE_KINDS.get(node, node), last - timeline.started_at, now - timeline.started_at, phase,
+            ))
+            result = value
+        last = now
+    return result
+
+
+def start_run(chatbot, timeline: RunTimeline) -> RunTimeline:
+    """
+    Run the timeline's prompt through `chatbot`, recording node timings into it
+    as they happen (callers can watch it from another thread). Stops at an
+    interrupt; call resume_timed() once a decision is made.
+    """
+    try:
+        _stream(chatbot, {"messages": [HumanMessage(content=timeline.prompt)]}, timeline, "run")
+        if timeline.interrupted_at is None:
+            _finish(chatbot, timeline)
+    except Exception as e:
+        timeline.error = f"{type(e).__name__}: {e}"
+        timeline.finished_at = time.time()
+    return timeline
+
+
+def resume_timed(chatbot, timeline: RunTimeline, decision: str):
+    """Close the interrupt wait and time the resumed part of the run."""
+    now = time.time()
+    timeline.decision = decision
+    timeline.events.append(TimelineEvent(
+        "interrupt", WAIT, timeline.interrupted_at - timeline.started_at, now - timeline.started_at,
+    ))
+    try:
+        _stream(chatbot, Command(resume=decision), timeline, "resume")
+        _finish(chatbot, timeline)
+    except Exception as e:
+        timeline.error = f"{type(e).__name__}: {e}"
+        timeline.finished_at = time.time()
+
+
+def _finish(chatbot, timeline: RunTimeline):
+    timeline.finished_at = time.time()
+    messages = chatbot.get_state(turn_config(timeline.thread_id)).values.get("messages", [])
+    timeline.output = messages[-1].content if messages else None
+
+
+# -------------------
+# 2. History and aggregates
+# -------------------
+class RunHistory:
+    """Completed run summaries; appended to LATENCY_LOG_PATH (JSONL) when set."""
+
+    def __init__(self, path: str | None = LATENCY_LOG_PATH, limit: int = 1000):
+        self.path = path
+        self.limit = limit
+        self._rows: list[dict] = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._rows = [json.loads(line) for line in f if line.strip()][-limit:]
+
+    def add(self, timeline: RunTimeline):
+        row = timeline.summary()
+        with self._lock:
+            self._rows.append(row)
+            del self._rows[:-self.limit]
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(row) + "\n")
+
+    def rows(self) -> list[dict]:
+        with self._lock:
+            return list(self._rows)
+
+    def aggregate(self) -> list[dict]:
+        """Per-graph latency stats over all recorded runs."""
+        stats = []
+        for graph in sorted({r["graph"] for r in self.rows()}):
+            runs = [r for r in self.rows() if r["graph"] == graph and not r["error"]]
+            if not runs:
+                continue
+            total = sorted(r["total_ms"] for r in runs)
+            active = [r["active_ms"] for r in runs]
+            waits = [r["wait_ms"] for r in runs if r["interrupted"]]
+            stats.append({
+                "graph": graph,
+                "runs": len(runs),
+                "mean_total_ms": round(statistics.fmean(total), 1),
+                "p50_total_ms": total[len(total) // 2],
+                "p95_total_ms": total[min(len(total) - 1, int(0.95 * len(total)))],
+                "mean_active_ms": round(statistics.fmean(active), 1),
+                "mean_wait_ms": round(statistics.fmean(waits), 1) if waits else 0.0,
+                "interrupt_rate": round(len(waits) / len(runs), 2),
+                "mean_llm_calls": round(statistics.fmean(r["llm_calls"] for r in runs), 2),
+                # Sequential turns per minute one session could sustain
+                "turns_per_min": round(60000 / statistics.fmean(total), 2) if statistics.fmean(total) else None,
+            })
+        return stats
+
+
+history = RunHistory()
@@ -0,0 +1,265 @@
+# memory_profile.py
+
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections.abc import Mapping
+
+try:
+    import psutil
+except ImportError:  # optional: only used for process RSS
+    psutil = None
+
+# Server-side report dumps always go here, under generated names
+MEMORY_REPORT_DIR = os.getenv("MEMORY_REPORT_DIR", "memory_reports")
+
+
+# -------------------
+# 1. Size helpers
+# -------------------
+def _typed_len(typed) -> int:
+    """Size of a serde `(type, bytes)` pair as stored by the checkpointer."""
+    return len(typed[1]) if typed and typed[1] is not None else 0
+
+
+def deep_sizeof(obj, _seen: set | None = None) -> int:
+    """Approximate in-memory size of `obj` and everything it references."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, Mapping):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def object_bytes(obj) -> int:
+    """Pickled size when possible (comparable across runs), else deep_sizeof."""
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return deep_sizeof(obj)
+
+
+# -------------------
+# 2. Checkpoints and threads
+# -------------------
+def checkpoint_usage(saver) -> dict[str, dict]:
+    """
+    Serialized bytes held by an in-memory checkpointer, per thread_id:
+    checkpoints, channel blobs and pending writes.
+    """
+    usage: dict[str, dict] = {}
+
+    def row(thread_id):
+        return usage.setdefault(thread_id, {
+            "checkpoints": 0, "checkpoint_bytes": 0, "blob_bytes": 0, "write_bytes": 0,
+        })
+
+    for thread_id, namespaces in list(saver.storage.items()):
+        r = row(thread_id)
+        for checkpoints in list(namespaces.values()):
+            for checkpoint, metadata, _parent in list(checkpoints.values()):
+                r["checkpoints"] += 1
+                r["checkpoint_bytes"] += _typed_len(checkpoint) + _typed_len(metadata)
+    for (thread_id, _ns, _channel, _version), typed in list(saver.blobs.items()):
+        row(thread_id)["blob_bytes"] += _typed_len(typed)
+    for (thread_id, _ns, _checkpoint_id), writes in list(saver.writes.items()):
+        row(thread_id)["write_bytes"] += sum(_typed_len(w[2]) for w in list(writes.values()))
+
+    for r in usage.values():
+        r["total_bytes"] = r["checkpoint_bytes"] + r["blob_bytes"] + r["write_bytes"]
+    return usage
+
+
+def thread_messages(chatbot, thread_id: str, top: int = 5) -> dict:
+    """Message count, total serialized size and the largest messages of a thread."""
+    state = chatbot.get_state({"configurable": {"thread_id": thread_id}})
+    messages = state.values.get("messages", [])
+    serde = chatbot.checkpointer.serde
+    sizes = [(i, _typed_len(serde.dumps_typed(m)), m) for i, m in enumerate(messages)]
+    largest = sorted(sizes, key=lambda s: s[1], reverse=True)[:top]
+    return {
+        "message_count": len(messages),
+        "message_bytes": sum(s[1] for s in sizes),
+        "largest": [
+            {"index": i, "type": type(m).__name__, "bytes": size, "preview": str(m.content)[:80]}
+            for i, size, m in largest
+        ],
+    }
+
+
+def graph_report(chatbot, top: int = 5) -> list[dict]:
+    """One row per thread of `chatbot`, largest first."""
+    rows = []
+    for thread_id, usage in checkpoint_usage(chatbot.checkpointer).items():
+        messages = thread_messages(chatbot, thread_id, top=top)
+        rows.append({"thread_id": thread_id, **usage, **messages})
+    return sorted(rows, key=lambda r: r["total_bytes"], reverse=True)
+
+
+# -------------------
+# 3. Session state
+# -------------------
+def session_report(state: Mapping) -> dict:
+    """Size of each key in a (Streamlit) session state mapping."""
+    keys = []
+    for key in list(state.keys()):
+        value = state[key]
+        entry = {"key": str(key), "type": type(value).__name__, "bytes": object_bytes(value)}
+        if isinstance(value, (list, tuple, dict)):
+            entry["items"] = len(value)
+        keys.append(entry)
+    keys.sort(key=lambda k: k["bytes"], reverse=True)
+    return {"total_bytes": sum(k["bytes"] for k in keys), "keys": keys}
+
+
+class SessionRegistry:
+    """
+    Weak references to the state of every live session, keyed by session id.
+
+    Each session registers itself on every run; entries disappear once the
+    session's state object is garbage collected.
+    """
+
+    def __init__(self):
+        self._states = weakref.WeakValueDictionary()
+        self._seen: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, state):
+        with self._lock:
+            self._states[session_id] = state
+            self._seen[session_id] = time.time()
+
+    def items(self) -> list[tuple[str, object, float]]:
+        with self._lock:
+            live = list(self._states.items())
+            self._seen = {sid: self._seen[sid] for sid, _ in live}
+            return [(sid, state, self._seen[sid]) for sid, state in live]
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+sessions = SessionRegistry()
+
+
+def sessions_report(registry: SessionRegistry, top: int = 5) -> list[dict]:
+    """One row per live session, largest first, with its biggest keys."""
+    rows = []
+    for session_id, state, last_seen in registry.items():
+        # Streamlit's per-session state exposes its key/value view as filtered_state
+        mapping = getattr(state, "filtered_state", state)
+        try:
+            report = session_report(mapping)
+        except RuntimeError:  # the session mutated its state mid-walk; skip this pass
+            continue
+        rows.append({
+            "session_id": session_id,
+            "last_run": last_seen,
+            "keys": len(report["keys"]),
+            "total_bytes": report["total_bytes"],
+            "largest": report["keys"][:top],
+        })
+    return sorted(rows, key=lambda r: r["total_bytes"], reverse=True)
+
+
+# -------------------
+# 4. tracemalloc snapshots
+# -------------------
+class TracemallocProfiler:
+    """On-demand tracemalloc snapshots, each diffed against the previous one."""
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._previous: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._previous = self._take()
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot_diff(self, top: int = 15) -> dict:
+        """Top allocation growth (by line) since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; call start() first")
+        with self._lock:
+            current = self._take()
+            stats = current.compare_to(self._previous, "lineno") if self._previous else current.statistics("lineno")
+            self._previous = current
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "location": str(s.traceback[0]),
+                    "size_bytes": s.size,
+                    "size_diff_bytes": getattr(s, "size_diff", 0),
+                    "count": s.count,
+                }
+                for s in stats[:top]
+            ],
+        }
+
+
+profiler = TracemallocProfiler()
+
+
+# -------------------
+# 5. Full report
+# -------------------
+def process_rss() -> int | None:
+    return psutil.Process().memory_info().rss if psutil else None
+
+
+def build_report(graphs: Mapping[str, object], session_state: Mapping | None = None, top: int = 5,
+                 registry: SessionRegistry | None = sessions) -> dict:
+    report = {
+        "timestamp": time.time(),
+        "process_rss_bytes": process_rss(),
+        "graphs": {name: graph_report(chatbot, top=top) for name, chatbot in graphs.items()},
+    }
+    if session_state is not None:
+        report["session"] = session_report(session_state)
+    if registry is not None:
+        report["sessions"] = sessions_report(registry, top=top)
+    return report
+
+
+def dump_report(report: dict, directory: str = MEMORY_REPORT_DIR) -> str:
+    """Write `report` to a new timestamped file in `directory`; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"memory_report_{time.strftime('%Y%m%d-%H%M%S')}_{os.urandom(3).hex()}.json")
+    with open(path, "x") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
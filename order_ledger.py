@@ -0,0 +1,218 @@
+# order_ledger.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from array import array
+from dataclasses import asdict, dataclass
+
+
+# -------------------
+# 1. Orders
+# -------------------
+@dataclass(frozen=True)
+class Order:
+    order_id: str
+    key: str
+    symbol: str
+    quantity: int
+    price: float | None
+    created_at: float
+
+
+def idempotency_key(thread_id: str, tool_call_id: str) -> str:
+    """Key that identifies one purchase request, stable across retries/replays."""
+    return f"{thread_id}:{tool_call_id}"
+
+
+def thread_of(key: str) -> str:
+    """thread_id part of an idempotency key."""
+    return key.rsplit(":", 1)[0]
+
+
+def order_id_for(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def ledger_path(name: str) -> str | None:
+    """Journal file for ledger `name` under ORDER_LEDGER_DIR, if that is set."""
+    directory = os.getenv("ORDER_LEDGER_DIR")
+    return os.path.join(directory, f"{name}.jsonl") if directory else None
+
+
+# -------------------
+# 2. Ledger
+# -------------------
+class OrderLedger:
+    """
+    Append-only, idempotent order ledger with incrementally maintained positions.
+
+    Positions live in parallel arrays indexed by a slot per (thread_id,
+    symbol), so each conversation has its own book, and the portfolio totals
+    are running sums, so reads never re-scan the orders.
+    If `journal_path` is given, the ledger is replayed from that JSONL file on
+    start and each new order is appended to it as one line.
+    """
+
+    def __init__(self, journal_path: str | None = None):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._reset()
+
+        if journal_path and os.path.exists(journal_path):
+            self.restore(journal_path)
+
+    def _reset(self):
+        self._orders: list[Order] = []
+        self._by_key: dict[str, int] = {}
+        self._slots: dict[tuple[str, str], int] = {}   # (thread_id, symbol) -> slot
+        self._symbols: list[str] = []
+        self._thread_slots: dict[str, list[int]] = {}
+        self._symbol_slots: dict[str, list[int]] = {}
+        self._thread_orders: dict[str, int] = {}
+        self._shares = array("q")       # shares held per slot
+        self._cost = array("d")         # cost basis of priced shares per slot
+        self._priced_shares = array("q")
+        self._total_shares = 0
+        self._total_cost = 0.0
+
+    def record(self, key: str, symbol: str, quantity: int, price: float | None = None) -> tuple[Order, bool]:
+        """
+        Append an order unless `key` was already recorded.
+
+        Returns (order, created); on a replay the original order is returned
+        with created=False.
+        """
+        with self._lock:
+            idx = self._by_key.get(key)
+            if idx is not None:
+                return self._orders[idx], False
+            order = Order(order_id_for(key), key, symbol.upper(), int(quantity), price, time.time())
+            # Journal first, so an order is never acknowledged but lost on restart
+            if self.journal_path:
+                self._journal(order)
+            self._apply(order)
+        return order, True
+
+    def _journal(self, order: Order):
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(asdict(order)) + "\n")
+
+    def _apply(self, order: Order):
+        thread_id = thread_of(order.key)
+        slot = self._slots.get((thread_id, order.symbol))
+        if slot is None:
+            slot = len(self._symbols)
+            self._slots[(thread_id, order.symbol)] = slot
+            self._symbols.append(order.symbol)
+            self._thread_slots.setdefault(thread_id, []).append(slot)
+            self._symbol_slots.setdefault(order.symbol, []).append(slot)
+            self._shares.append(0)
+            self._cost.append(0.0)
+            self._priced_shares.append(0)
+
+        self._by_key[order.key] = len(self._orders)
+        self._orders.append(order)
+        self._thread_orders[thread_id] = self._thread_orders.get(thread_id, 0) + 1
+        self._shares[slot] += order.quantity
+        self._total_shares += order.quantity
+        if order.price is not None:
+            notional = order.price * order.quantity
+            self._cost[slot] += notional
+            self._priced_shares[slot] += order.quantity
+            self._total_cost += notional
+
+    # -------------------
+    # 3. Reads
+    # -------------------
+    def get(self, key: str) -> Order | None:
+        idx = self._by_key.get(key)
+        return None if idx is None else self._orders[idx]
+
+    def position(self, symbol: str, thread_id: str | None = None) -> dict:
+        """Position in `symbol` for one thread, or across all threads if None."""
+        symbol = symbol.upper()
+        with self._lock:
+            if thread_id is None:
+                slots = self._symbol_slots.get(symbol, [])
+            else:
+                slot = self._slots.get((thread_id, symbol))
+                slots = [] if slot is None else [slot]
+            return self._position(symbol, slots)
+
+    def _position(self, symbol: str, slots: list[int]) -> dict:
+        cost = sum(self._cost[s] for s in slots)
+        priced = sum(self._priced_shares[s] for s in slots)
+        return {
+            "symbol": symbol,
+            "shares": sum(self._shares[s] for s in slots),
+            "cost_basis": round(cost, 2),
+            "avg_price": round(cost / priced, 4) if priced else None,
+        }
+
+    def totals(self) -> dict:
+        """Running totals over every thread (the whole book)."""
+        return {
+            "order_count": len(self._orders),
+            "total_shares": self._total_shares,
+            "total_cost_basis": round(self._total_cost, 2),
+        }
+
+    def portfolio(self, thread_id: str | None = None) -> dict:
+        """Holdings of one thread, or of the whole book if thread_id is None."""
+        with self._lock:
+            if thread_id is None:
+                positions = [self._position(sym, slots) for sym, slots in self._symbol_slots.items()]
+                totals = self.totals()
+            else:
+                positions = [self._position(self._symbols[s], [s]) for s in self._thread_slots.get(thread_id, [])]
+                totals = {
+                    "order_count": self._thread_orders.get(thread_id, 0),
+                    "total_shares": sum(p["shares"] for p in positions),
+                    "total_cost_basis": round(sum(p["cost_basis"] for p in positions), 2),
+                }
+            return {"positions": [p for p in positions if p["shares"]], **totals}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    # -------------------
+    # 4. Persistence
+    # -------------------
+    def snapshot(self, path: str):
+        """Atomically write all orders to `path` as JSONL (a compacted journal)."""
+        with self._lock:
+            data = [asdict(o) for o in self._orders]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in data)
+        os.replace(tmp, path)
+
+    def restore(self, path: str | None = None):
+        """Replace the in-memory state with the orders journaled at `path`."""
+        path = path or self.journal_path
+        with open(path, "rb") as f:
+            lines = f.readlines()
+        with self._lock:
+            self._reset()
+            valid = 0
+            for i, line in enumerate(lines):
+                try:
+                    row = json.loads(line) if line.strip() else None
+                except json.JSONDecodeError:
+                    if i < len(lines) - 1:
+                        raise
+                    # Torn final line from a crash mid-append: drop it so new
+                    # orders don't get glued onto it
+                    if path == self.journal_path:
+                        os.truncate(path, valid)
+                    break
+                if row is not None:
+                    self._apply(Order(**row))
+                valid += len(line)
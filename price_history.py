@@ -0,0 +1,258 @@
+# price_history.py
+
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import numpy as np
+import requests
+
+from quotes import api_quota
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are not serialised across processes
+    fcntl = None
+
+# -------------------
+# 1. Settings
+# -------------------
+HISTORY_DIR = os.getenv(
+    "PRICE_HISTORY_DIR", os.path.join(tempfile.gettempdir(), "hitl_price_history")
+)
+# Minimum seconds between upstream refreshes of the same symbol
+REFRESH_INTERVAL = float(os.getenv("PRICE_HISTORY_REFRESH_SECONDS", str(6 * 3600)))
+# "compact" returns the latest 100 trading days; "full" (20+ years) needs a
+# premium key, so it is only used for backfills when PRICE_HISTORY_FULL=1
+COMPACT_DAYS = 100
+FULL_BACKFILL = os.getenv("PRICE_HISTORY_FULL", "0") == "1"
+TRADING_DAYS_PER_YEAR = 252
+
+# One file per column; dates are stored as days since 1970-01-01
+COLUMNS = {
+    "date": np.int32,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+}
+_FIELDS = {"open": "1. open", "high": "2. high", "low": "3. low", "close": "4. close", "volume": "5. volume"}
+
+
+# Symbols become directory names, so only plain tickers (e.g. AAPL, BRK.B) are allowed
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,9}$")
+
+
+class PriceHistoryError(Exception):
+    """Raised when no history is available for a symbol."""
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Upper-cased ticker; raises PriceHistoryError for anything else."""
+    symbol = str(symbol).strip().upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise PriceHistoryError(f"Invalid ticker symbol: {symbol!r}")
+    return symbol
+
+
+# -------------------
+# 2. Columnar cache
+# -------------------
+class PriceHistoryCache:
+    """
+    Daily OHLCV history stored as one raw, append-only column file per field.
+
+    Reads memory-map the files, so answering a question touches only the pages
+    it needs; refreshes append only the days newer than the last stored one.
+    The cache directory is shared by every process on the host, so refreshes
+    and appends hold an `flock` on the symbol's lock file as well as a thread
+    lock; the lock file's mtime records the last refresh by any process.
+    """
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._refreshed_at: dict[str, float] = {}
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _path(self, symbol: str, column: str) -> str:
+        return os.path.join(self.root, normalize_symbol(symbol), f"{column}.bin")
+
+    @contextmanager
+    def _exclusive(self, symbol: str):
+        """Hold the symbol's thread lock and its cross-process file lock."""
+        symbol = normalize_symbol(symbol)
+        with self._lock(symbol):
+            os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+            fd = os.open(os.path.join(self.root, symbol, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield fd
+            finally:
+                os.close(fd)  # also releases the flock
+
+    def load(self, symbol: str) -> dict[str, np.ndarray]:
+        """Memory-map every column of `symbol` (read-only, oldest day first)."""
+        symbol = normalize_symbol(symbol)
+        cols = {}
+        for name, dtype in COLUMNS.items():
+            path = self._path(symbol, name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size:
+                cols[name] = np.memmap(path, dtype=dtype, mode="r")
+            else:
+                cols[name] = np.empty(0, dtype=dtype)
+        # The date column is written last, so it bounds the committed rows
+        n = min(len(c) for c in cols.values())
+        return {name: c[:n] for name, c in cols.items()}
+
+    def last_date(self, symbol: str) -> int | None:
+        dates = self.load(symbol)["date"]
+        return int(dates[-1]) if len(dates) else None
+
+    def append(self, symbol: str, rows: dict[str, np.ndarray]) -> int:
+        """Append rows (sorted by date) that are newer than the stored history."""
+        symbol = normalize_symbol(symbol)
+        with self._exclusive(symbol):
+            return self._append(symbol, rows)
+
+    def _append(self, symbol: str, rows: dict[str, np.ndarray]) -> int:
+        # Caller holds _exclusive(symbol), so last_date can't move under us
+        last = self.last_date(symbol)
+        keep = rows["date"] > last if last is not None else slice(None)
+        new = {name: np.asarray(rows[name][keep], dtype=dtype) for name, dtype in COLUMNS.items()}
+        count = len(new["date"])
+        if not count:
+            return 0
+
+        # Trim any partially written rows, then append values before dates
+        committed = len(self.load(symbol)["date"])
+        for name in [*_FIELDS, "date"]:
+            with open(self._path(symbol, name), "ab") as f:
+                f.truncate(committed * np.dtype(COLUMNS[name]).itemsize)
+                f.write(new[name].tobytes())
+        return count
+
+    def refresh(self, symbol: str, timeout: float | None = None, force: bool = False) -> int:
+        """Fetch daily bars from Alpha Vantage and append the new ones."""
+        symbol = normalize_symbol(symbol)
+        if not force and time.time() - self._refreshed_at.get(symbol, 0) < REFRESH_INTERVAL:
+            return 0
+        with self._exclusive(symbol) as fd:
+            # Another process may have refreshed while we waited for the lock
+            refreshed_at = os.fstat(fd).st_mtime if os.fstat(fd).st_size else 0.0
+            self._refreshed_at[symbol] = max(self._refreshed_at.get(symbol, 0), refreshed_at)
+            if not force and time.time() - self._refreshed_at[symbol] < REFRESH_INTERVAL:
+                return 0
+            last = self.last_date(symbol)
+            today = int(np.datetime64("today", "D").astype(np.int64))
+            needs_backfill = last is None or today - last >= COMPACT_DAYS
+            outputsize = "full" if FULL_BACKFILL and needs_backfill else "compact"
+            rows = fetch_daily_series(symbol, outputsize=outputsize, timeout=timeout)
+            added = self._append(symbol, rows)
+            # Mark the refresh for every process (a non-empty lock file has a valid mtime)
+            os.pwrite(fd, str(time.time()).encode(), 0)
+            self._refreshed_at[symbol] = time.time()
+            return added
+
+
+def fetch_daily_series(symbol: str, outputsize: str = "compact", timeout: float | None = None) -> dict[str, np.ndarray]:
+    """Download TIME_SERIES_DAILY for `symbol` as sorted column arrays."""
+    url = (
+        "https://www.alphavantage.co/query"
+        f"?function=TIME_SERIES_DAILY&symbol={quote(symbol)}&outputsize={quote(outputsize)}"
+        "&apikey=C9PE94QUEW9VWGFM"
+    )
+    api_quota.record()
+    data = requests.get(url, timeout=timeout).json()
+    series = data.get("Time Series (Daily)")
+    if not series:
+        message = data.get("Note") or data.get("Information") or data.get("Error Message")
+        raise PriceHistoryError(message or f"No daily series returned for {symbol}.")
+
+    days = sorted(series)
+    rows = {"date": np.array(days, dtype="datetime64[D]").astype(np.int32)}
+    for name, key in _FIELDS.items():
+        rows[name] = np.array([float(series[d][key]) for d in days])
+    return rows
+
+
+# -------------------
+# 3. Indicators (vectorized)
+# -------------------
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; element i covers values[i : i + window]."""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if len(values) < window:
+        return np.empty(0)
+    csum = np.cumsum(np.concatenate(([0.0], values)))
+    return (csum[window:] - csum[:-window]) / window
+
+
+def log_returns(values: np.ndarray) -> np.ndarray:
+    return np.diff(np.log(values))
+
+
+def summarize(cols: dict[str, np.ndarray], days: int = 30, sma_windows: tuple[int, ...] = (20, 50)) -> dict:
+    """Period return, range, volatility and moving averages over the last `days` bars."""
+    close = np.asarray(cols["close"])
+    if not len(close):
+        raise PriceHistoryError("No price history stored.")
+    days = max(1, min(days, len(close) - 1)) if len(close) > 1 else 0
+    window = close[-(days + 1):]
+    rets = log_returns(window)
+
+    summary = {
+        "as_of": str(np.datetime64(int(cols["date"][-1]), "D")),
+        "last_close": round(float(close[-1]), 4),
+        "period_days": days,
+        "period_return_pct": round(float(window[-1] / window[0] - 1) * 100, 2),
+        "period_high": round(float(np.max(cols["high"][-days:] if days else close)), 4),
+        "period_low": round(float(np.min(cols["low"][-days:] if days else close)), 4),
+        "annualized_volatility_pct": (
+            round(float(np.std(rets, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) * 100, 2)
+            if len(rets) > 1 else None
+        ),
+        "history_days": len(close),
+    }
+    for w in sma_windows:
+        sma = moving_average(close, w)
+        summary[f"sma_{w}"] = round(float(sma[-1]), 4) if len(sma) else None
+    return summary
+
+
+# -------------------
+# 4. Tool helper
+# -------------------
+history_cache = PriceHistoryCache()
+
+
+def price_history_summary(symbol: str, days: int = 30, sma_window: int = 50, timeout: float | None = None) -> dict:
+    """Refresh `symbol` if due and summarise its stored history."""
+    try:
+        symbol = normalize_symbol(symbol)
+    except PriceHistoryError as e:
+        return {"symbol": symbol, "error": str(e)}
+    if days < 1 or sma_window < 1:
+        return {"symbol": symbol, "error": "days and sma_window must be at least 1."}
+    if timeout is not None and timeout <= 0:
+        return {"symbol": symbol, "error": f"Timed out before fetching price history for {symbol}."}
+    try:
+        history_cache.refresh(symbol, timeout=timeout)
+    except (PriceHistoryError, requests.RequestException) as e:
+        # Fall back to whatever is already on disk
+        if history_cache.last_date(symbol) is None:
+            return {"symbol": symbol, "error": str(e)}
+    windows = tuple(sorted({20, 50, int(sma_window)}))
+    return {"symbol": symbol, **summarize(history_cache.load(symbol), days=days, sma_windows=windows)}
@@ -0,0 +1,196 @@
+# quote_table.py
+
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import NamedTuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialised across processes
+    fcntl = None
+
+# -------------------
+# 1. Layout
+# -------------------
+# Header: magic, slot count, slot size (padded to 64 bytes)
+MAGIC = b"HITLQT01"
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+
+# API call counters in the header padding: minute bucket and its count,
+# day bucket and its count (older tables have zeros here, i.e. no calls)
+CALLS = struct.Struct("<qIqI")
+CALLS_OFFSET = HEADER.size
+
+# Slot: seqlock counter, symbol, price, change, change %, volume, timestamp
+SLOT = struct.Struct("<Q16sddddd")
+SEQ = struct.Struct("<Q")
+SLOT_SIZE = SLOT.size  # 64 bytes
+
+DEFAULT_SLOTS = 1024
+MAX_PROBE = 8
+READ_RETRIES = 100
+
+
+def _default_path() -> str:
+    """Per-user location (never the shared /tmp), created owner-only."""
+    base = os.getenv("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".cache")
+    directory = os.path.join(base, "hitl_demo")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, "quote_table.bin")
+
+
+QUOTE_TABLE_PATH = os.getenv("QUOTE_TABLE_PATH") or _default_path()
+
+
+class QuoteRecord(NamedTuple):
+    symbol: str
+    price: float
+    change: float
+    change_pct: float
+    volume: float
+    timestamp: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+
+# -------------------
+# 2. Table
+# -------------------
+class SharedQuoteTable:
+    """
+    Host-wide quote table in a memory-mapped file with fixed-size slots.
+
+    Every process of the same user that opens the same path shares the slots.
+    Readers are lock-free: each slot carries a seqlock counter that writers
+    make odd while updating, so a reader retries instead of returning a torn
+    record. Writers additionally take a thread lock and a short `flock`, so no
+    two threads or processes bump the same counter at once (Python has no
+    atomic compare-and-swap on mmap memory, and `flock` on one shared fd does
+    not exclude threads of the same process).
+    """
+
+    def __init__(self, path: str = QUOTE_TABLE_PATH, slots: int = DEFAULT_SLOTS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        # Prices from this table reach the approval panel and the ledger
+        if hasattr(os, "getuid") and os.fstat(self._fd).st_uid != os.getuid():
+            os.close(self._fd)
+            raise ValueError(f"{path} is owned by another user")
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        with self._write_lock():
+            if os.fstat(self._fd).st_size < HEADER_SIZE:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, slots, SLOT_SIZE), 0)
+            magic, slots, slot_size = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+        if magic != MAGIC or slot_size != SLOT_SIZE:
+            raise ValueError(f"{path} is not a quote table")
+        self.slots = slots
+        self._mm = mmap.mmap(self._fd, HEADER_SIZE + slots * SLOT_SIZE)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, key: bytes):
+        start = zlib.crc32(key) % self.slots
+        for i in range(min(MAX_PROBE, self.slots)):
+            yield HEADER_SIZE + ((start + i) % self.slots) * SLOT_SIZE
+
+    def _read_slot(self, offset: int) -> tuple | None:
+        """Consistent copy of one slot, or None if it stayed busy."""
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(self._mm, offset)[0]
+            if seq & 1:
+                continue
+            record = SLOT.unpack_from(self._mm, offset)
+            if SEQ.unpack_from(self._mm, offset)[0] == seq == record[0]:
+                return record
+        return None
+
+    @staticmethod
+    def _key(symbol: str) -> bytes:
+        return symbol.upper().encode("ascii", "ignore")[:16].ljust(16, b"\0")
+
+    def get(self, symbol: str, max_age: float | None = None) -> QuoteRecord | None:
+        key = self._key(symbol)
+        for offset in self._offsets(key):
+            record = self._read_slot(offset)
+            if record is None:
+                continue
+            if record[1] == key:
+                quote = QuoteRecord(symbol.upper(), *record[2:])
+                if max_age is not None and quote.age > max_age:
+                    return None
+                return quote
+            if record[1] == bytes(16):
+                return None
+        return None
+
+    def put(self, symbol: str, price: float, change: float = math.nan, change_pct: float = math.nan,
+            volume: float = math.nan, timestamp: float | None = None):
+        key = self._key(symbol)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._write_lock():
+            # Reuse this symbol's slot, else the first empty one, else the stalest
+            target, oldest = None, None
+            for offset in self._offsets(key):
+                _, slot_key, *_, slot_ts = SLOT.unpack_from(self._mm, offset)
+                if slot_key == key or slot_key == bytes(16):
+                    target = offset
+                    break
+                if oldest is None or slot_ts < oldest[1]:
+                    oldest = (offset, slot_ts)
+            offset = target if target is not None else oldest[0]
+
+            seq = SEQ.unpack_from(self._mm, offset)[0]
+            SEQ.pack_into(self._mm, offset, seq + 1)  # odd: write in progress
+            SLOT.pack_into(self._mm, offset, seq + 1, key, price, change, change_pct, volume, timestamp)
+            SEQ.pack_into(self._mm, offset, seq + 2)
+
+    # -------------------
+    # 3. Shared API call counters
+    # -------------------
+    def _calls(self, now: float) -> list[int]:
+        minute, per_minute, day, per_day = CALLS.unpack_from(self._mm, CALLS_OFFSET)
+        if minute != int(now // 60):
+            minute, per_minute = int(now // 60), 0
+        if day != int(now // 86400):
+            day, per_day = int(now // 86400), 0
+        return [minute, per_minute, day, per_day]
+
+    def record_call(self) -> tuple[int, int]:
+        """Count one upstream API call for every process; returns calls() after it."""
+        with self._write_lock():
+            counters = self._calls(time.time())
+            counters[1] += 1
+            counters[3] += 1
+            CALLS.pack_into(self._mm, CALLS_OFFSET, *counters)
+        return counters[1], counters[3]
+
+    def calls(self) -> tuple[int, int]:
+        """Upstream calls by all processes in the current minute and UTC day."""
+        with self._write_lock():
+            _, per_minute, _, per_day = self._calls(time.time())
+        return per_minute, per_day
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
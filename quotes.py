@@ -0,0 +1,141 @@
+# quotes.py
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+from quote_table import SharedQuoteTable
+
+logger = logging.getLogger(__name__)
+
+# Quotes younger than this are served from the host-wide table
+QUOTE_MAX_AGE = float(os.getenv("QUOTE_MAX_AGE_SECONDS", "60"))
+
+
+class ApiQuota:
+    """
+    Count of Alpha Vantage calls made with the shared API key.
+
+    The key's limits apply to every process on the host, so calls are counted
+    in the shared quote table (per minute and per UTC day) when it is
+    available, else in a per-process sliding window. Interactive calls are
+    always made; background work asks `allow(share)` so it only uses its share
+    of the limits.
+    """
+
+    def __init__(self, per_minute: int, per_day: int, table: SharedQuoteTable | None = None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.table = table
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def record(self):
+        if self.table is not None:
+            self.table.record_call()
+            return
+        with self._lock:
+            self._calls.append(time.time())
+
+    def used(self) -> tuple[int, int]:
+        """Calls in the last minute and in the last day."""
+        if self.table is not None:
+            return self.table.calls()
+        now = time.time()
+        with self._lock:
+            while self._calls and now - self._calls[0] > 86400:
+                self._calls.popleft()
+            minute = sum(1 for t in reversed(self._calls) if now - t <= 60)
+            return minute, len(self._calls)
+
+    def allow(self, share: float = 1.0) -> bool:
+        minute, day = self.used()
+        return minute < self.per_minute * share and day < self.per_day * share
+
+
+try:
+    quote_table = SharedQuoteTable()
+except (OSError, ValueError):
+    logger.exception("Shared quote table unavailable; every quote hits the network")
+    quote_table = None
+
+api_quota = ApiQuota(
+    per_minute=int(os.getenv("QUOTE_QUOTA_PER_MINUTE", "5")),
+    per_day=int(os.getenv("QUOTE_QUOTA_PER_DAY", "25")),
+    table=quote_table,
+)
+
+
+def _number(value) -> float:
+    try:
+        return float(str(value).rstrip("%"))
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def parse_quote_price(result) -> float | None:
+    """Price from a GLOBAL_QUOTE payload, or None if it has none."""
+    if not isinstance(result, dict):
+        return None
+    price = _number((result.get("Global Quote") or {}).get("05. price"))
+    return None if math.isnan(price) else price
+
+
+def fetch_global_quote(symbol: str, timeout: float | None = None) -> dict:
+    """Fetch GLOBAL_QUOTE from Alpha Vantage (always a network call)."""
+    url = (
+        "https://www.alphavantage.co/query"
+        f"?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
+    )
+    api_quota.record()
+    r = requests.get(url, timeout=timeout)
+    return r.json()
+
+
+def store_quote(symbol: str, data: dict) -> bool:
+    """Publish a GLOBAL_QUOTE payload to the shared table; False if it has no price."""
+    quote = data.get("Global Quote") or {}
+    price = _number(quote.get("05. price"))
+    if quote_table is None or math.isnan(price):
+        return False
+    quote_table.put(
+        symbol,
+        price,
+        change=_number(quote.get("09. change")),
+        change_pct=_number(quote.get("10. change percent")),
+        volume=_number(quote.get("06. volume")),
+    )
+    return True
+
+
+def cached_quote(symbol: str, max_age: float = QUOTE_MAX_AGE) -> dict | None:
+    """GLOBAL_QUOTE-shaped payload from the shared table, if fresh enough."""
+    if quote_table is None:
+        return None
+    record = quote_table.get(symbol, max_age=max_age)
+    if record is None:
+        return None
+    quote = {"01. symbol": record.symbol, "05. price": f"{record.price:.4f}"}
+    if not math.isnan(record.volume):
+        quote["06. volume"] = str(int(record.volume))
+    if not math.isnan(record.change):
+        quote["09. change"] = f"{record.change:.4f}"
+    if not math.isnan(record.change_pct):
+        quote["10. change percent"] = f"{record.change_pct:.4f}%"
+    return {"Global Quote": quote, "source": "shared-table", "staleness_seconds": round(record.age, 1)}
+
+
+def get_global_quote(symbol: str, timeout: float | None = None) -> dict:
+    """Quote for `symbol`: shared table first, then Alpha Vantage (and publish it)."""
+    symbol = symbol.upper()
+    cached = cached_quote(symbol)
+    if cached is not None:
+        return cached
+    data = fetch_global_quote(symbol, timeout=timeout)
+    store_quote(symbol, data)
+    return data
@@ -0,0 +1,102 @@
+# speculation.py
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Speculation spends one extra LLM call per approval (the unused branch)
+SPECULATE_ENABLED = os.getenv("SPECULATE_APPROVALS", "1") == "1"
+
+
+@dataclass
+class ApprovalPreview:
+    """Work done for one pending approval while the human decides."""
+    thread_id: str
+    tool_call_id: str
+    symbol: str
+    quantity: int
+    messages: list[BaseMessage]
+    price: float | None = None
+    notional: float | None = None
+    # decision -> (predicted ToolMessage content, pre-built LLM response)
+    continuations: dict[str, tuple[Any, BaseMessage]] = field(default_factory=dict)
+    quote_ready: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class ApprovalSpeculator:
+    """
+    Runs `job(preview)` in the background for each pending approval.
+
+    The job fills in the quote/notional for the approval panel and pre-builds
+    the LLM continuation for each decision. `take_continuation` hands one back
+    only if the real tool result matches the predicted one exactly.
+    """
+
+    def __init__(self, job: Callable[[ApprovalPreview], None], enabled: bool = SPECULATE_ENABLED, max_workers: int = 4):
+        self.job = job
+        self.enabled = enabled
+        self._previews: dict[str, ApprovalPreview] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, preview: ApprovalPreview) -> ApprovalPreview:
+        """Begin speculating for `preview` unless this tool call already is."""
+        with self._lock:
+            current = self._previews.get(preview.thread_id)
+            if current is not None and current.tool_call_id == preview.tool_call_id:
+                return current
+            self._previews[preview.thread_id] = preview
+        if self.enabled:
+            self._executor.submit(self._run, preview)
+        else:
+            preview.quote_ready.set()
+            preview.done.set()
+        return preview
+
+    def _run(self, preview: ApprovalPreview):
+        try:
+            self.job(preview)
+        except Exception:
+            logger.exception("Speculation failed for thread %s", preview.thread_id)
+        finally:
+            preview.quote_ready.set()
+            preview.done.set()
+
+    def get(self, thread_id: str) -> ApprovalPreview | None:
+        return self._previews.get(thread_id)
+
+    def take_continuation(self, thread_id: str, messages: list[BaseMessage]) -> BaseMessage | None:
+        """
+        Return the pre-built response if `messages` is exactly the speculated
+        history plus the predicted tool result. The preview is dropped either way.
+        """
+        last = messages[-1] if messages else None
+        if not isinstance(last, ToolMessage):
+            return None
+        with self._lock:
+            preview = self._previews.get(thread_id)
+            if preview is None or preview.tool_call_id != last.tool_call_id:
+                return None
+            del self._previews[thread_id]
+
+        if len(messages) == len(preview.messages) + 1:
+            for predicted, response in list(preview.continuations.values()):
+                if predicted == last.content:
+                    self.hits += 1
+                    return response
+        self.misses += 1
+        return None
+
+    def discard(self, thread_id: str):
+        with self._lock:
+            self._previews.pop(thread_id, None)
@@ -0,0 +1,50 @@
+# tests/test_quote_table.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from quote_table import SEQ, SLOT, SharedQuoteTable
+
+
+def _seq(table: SharedQuoteTable, symbol: str) -> int:
+    key = table._key(symbol)
+    offset = next(o for o in table._offsets(key) if SLOT.unpack_from(table._mm, o)[1] == key)
+    return SEQ.unpack_from(table._mm, offset)[0]
+
+
+def test_put_get_roundtrip(tmp_path):
+    table = SharedQuoteTable(str(tmp_path / "quotes.bin"), slots=16)
+    table.put("aapl", 187.5, change=1.25, volume=1000)
+    quote = table.get("AAPL")
+    assert quote.symbol == "AAPL"
+    assert quote.price == 187.5
+    assert quote.change == 1.25
+    assert table.get("MSFT") is None
+    table.close()
+
+
+def test_concurrent_writers_keep_seqlock_even(tmp_path):
+    """Threads sharing one table must not lose seqlock increments."""
+    table = SharedQuoteTable(str(tmp_path / "quotes.bin"), slots=16)
+    threads, puts = 8, 2000
+
+    def hammer(i):
+        for n in range(puts):
+            table.put("AAPL", 100.0 + i, volume=n)
+            assert table.get("AAPL") is not None
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(hammer, range(threads)))
+
+    assert _seq(table, "AAPL") == 2 * threads * puts
+    assert table.get("AAPL") is not None
+    table.close()
+
+
+def test_api_call_counters_shared_between_handles(tmp_path):
+    path = str(tmp_path / "quotes.bin")
+    first, second = SharedQuoteTable(path, slots=16), SharedQuoteTable(path, slots=16)
+    first.record_call()
+    second.record_call()
+    assert first.calls() == (2, 2)
+    first.close()
+    second.close()
@@ -0,0 +1,196 @@
+# watchlist.py
+
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from quotes import api_quota, cached_quote, fetch_global_quote, get_global_quote, store_quote
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Settings
+# -------------------
+# Symbols always kept warm, e.g. WATCHLIST=AAPL,TSLA,MSFT
+WATCHLIST = [s.strip().upper() for s in os.getenv("WATCHLIST", "").split(",") if s.strip()]
+# How many recently requested symbols are also kept warm
+MAX_LEARNED = int(os.getenv("WATCHLIST_MAX_LEARNED", "10"))
+# Refresh a symbol at most this often
+REFRESH_SECONDS = float(os.getenv("WATCHLIST_REFRESH_SECONDS", "300"))
+# Serve from memory while the quote is younger than this
+MAX_STALENESS = float(os.getenv("WATCHLIST_MAX_STALENESS_SECONDS", "900"))
+# Fraction of the API quota background refreshes may use
+QUOTA_SHARE = float(os.getenv("WATCHLIST_QUOTA_SHARE", "0.5"))
+
+
+# -------------------
+# 2. Refresher
+# -------------------
+class WatchlistRefresher:
+    """
+    Keeps quotes for watched symbols in memory, refreshed in the background.
+
+    Watched symbols are the configured list plus the most recently requested
+    ones. The scheduler refreshes the stalest symbol whenever the API quota
+    share allows, and pushes each new quote to every subscriber queue.
+    """
+
+    def __init__(self, symbols=WATCHLIST, max_learned: int = MAX_LEARNED, refresh_seconds: float = REFRESH_SECONDS,
+                 max_staleness: float = MAX_STALENESS, quota_share: float = QUOTA_SHARE):
+        self.configured = list(symbols)
+        self.max_learned = max_learned
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness = max_staleness
+        self.quota_share = quota_share
+        self._learned: OrderedDict[str, None] = OrderedDict()
+        self._quotes: dict[str, tuple[dict, float]] = {}
+        self._attempted: dict[str, float] = {}
+        self._subscribers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def symbols(self) -> list[str]:
+        with self._lock:
+            return list(dict.fromkeys([*self.configured, *self._learned]))
+
+    def learn(self, symbol: str):
+        """Remember a symbol from a tool call (LRU, capped at max_learned)."""
+        symbol = symbol.upper()
+        with self._lock:
+            if symbol in self.configured:
+                return
+            is_new = symbol not in self._learned
+            self._learned[symbol] = None
+            self._learned.move_to_end(symbol)
+            while len(self._learned) > self.max_learned:
+                dropped, _ = self._learned.popitem(last=False)
+                self._quotes.pop(dropped, None)
+        if is_new:
+            self._wake.set()
+
+    def get(self, symbol: str) -> dict | None:
+        """In-memory quote for a watched symbol, with staleness metadata."""
+        entry = self._quotes.get(symbol.upper())
+        if entry is None:
+            return None
+        data, fetched_at = entry
+        staleness = time.time() - fetched_at
+        if staleness > self.max_staleness:
+            return None
+        return {**data, "source": "watchlist", "staleness_seconds": round(staleness, 1)}
+
+    def put(self, symbol: str, data: dict, fetched_at: float | None = None):
+        """Keep `data` for a watched symbol and push it to subscribers."""
+        symbol = symbol.upper()
+        if symbol not in self.configured and symbol not in self._learned:
+            return
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        data = {"Global Quote": data.get("Global Quote", {})}
+        self._quotes[symbol] = (data, fetched_at)
+        update = {"symbol": symbol, "quote": data["Global Quote"], "fetched_at": fetched_at}
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(update)
+            except queue.Full:
+                pass  # slow subscriber; it will catch up from snapshot()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Latest quote per watched symbol, for initial rendering."""
+        return {s: self.get(s) for s in self.symbols() if self.get(s) is not None}
+
+    # -------------------
+    # 3. Subscriptions
+    # -------------------
+    def subscribe(self, maxsize: int = 100) -> queue.Queue:
+        """
+        Queue receiving {"symbol", "quote", "fetched_at"} for every refresh.
+        Subscriptions are weak: dropping the queue unsubscribes it.
+        """
+        q = queue.Queue(maxsize=maxsize)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        self._subscribers.discard(q)
+
+    # -------------------
+    # 4. Scheduler
+    # -------------------
+    def _due(self) -> str | None:
+        """Stalest watched symbol that is due for a refresh (never-fetched first)."""
+        now = time.time()
+        last = {
+            s: max(self._quotes.get(s, (None, 0.0))[1], self._attempted.get(s, 0.0))
+            for s in self.symbols()
+        }
+        due = [(t, s) for s, t in last.items() if now - t >= self.refresh_seconds]
+        return min(due)[1] if due else None
+
+    def refresh_once(self, timeout: float = 10.0) -> str | None:
+        """Refresh the most overdue symbol if the quota allows; returns it."""
+        symbol = self._due()
+        if symbol is None:
+            return None
+        # Another process on the host may already have it
+        shared = cached_quote(symbol, max_age=self.refresh_seconds)
+        if shared is not None:
+            self.put(symbol, shared, fetched_at=time.time() - shared["staleness_seconds"])
+            return symbol
+        if not api_quota.allow(self.quota_share):
+            return None
+        # Failed symbols (bad ticker, rate-limit note) wait a full interval too
+        self._attempted[symbol] = time.time()
+        data = fetch_global_quote(symbol, timeout=timeout)
+        if store_quote(symbol, data):
+            self.put(symbol, data)
+        return symbol
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    refreshed = self.refresh_once()
+                except Exception:
+                    logger.warning("Watchlist refresh failed", exc_info=True)
+                    refreshed = None
+                # Spread calls so the quota share lasts the whole minute
+                pause = 60 / max(1.0, api_quota.per_minute * self.quota_share)
+                self._wake.wait(0.1 if refreshed else pause)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=run, name="watchlist-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+refresher = WatchlistRefresher()
+
+
+def get_quote(symbol: str, timeout: float | None = None) -> dict:
+    """
+    Quote for `symbol`, served from the watchlist when possible.
+    Every requested symbol is learned so later requests for it are warm.
+    """
+    warm = refresher.get(symbol)
+    if warm is not None:
+        refresher.learn(symbol)
+        return warm
+    data = get_global_quote(symbol, timeout=timeout)
+    # Learn after fetching so the refresher doesn't duplicate this call
+    refresher.learn(symbol)
+    if (data.get("Global Quote") or {}).get("05. price"):
+        refresher.put(symbol, data, fetched_at=time.time() - data.get("staleness_seconds", 0))
+    return data